@@ -1,79 +1,66 @@
 from aqt import gui_hooks, mw
 from aqt.qt import (QWidget, QVBoxLayout, QShortcut, QKeySequence, QAction, QObject, QEvent, QMenu, 
-                    QSplitter, Qt, QDockWidget, QSizePolicy, QUrl)
+                    QSplitter, Qt, QDockWidget, QSizePolicy, QUrl, QTimer)
 from aqt.utils import tooltip, qconnect
 from aqt.gui_hooks import browser_will_show
-from .browser import BrowserWidget
+# browser.py (QtWebEngine), settings.py and the other modules are imported on
+# first use, so Anki startup only pays for the hooks and the menu entry below.
+# tools/check_lazy_imports.py checks that only config.py is loaded here.
 from . import config
-from .config import PREDEFINED_SEARCH_SITES
-from .settings import SettingsDialog
 
-class BrowserEventFilter(QObject):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.parent = parent
+# Ctrl on Windows/Linux, Cmd on macOS
+_COMMAND_MODIFIERS = Qt.KeyboardModifier.MetaModifier | Qt.KeyboardModifier.ControlModifier
 
-    def eventFilter(self, obj, event):
-        if event.type() == QEvent.Type.KeyPress:
-            if (event.key() == Qt.Key.Key_W and 
-                (event.modifiers() & (Qt.KeyboardModifier.MetaModifier | Qt.KeyboardModifier.ControlModifier)) and
-                hasattr(self.parent, '_browser_sidebar') and
-                self.parent._browser_sidebar.isVisible() and
-                self.parent._browser_sidebar.tabs.count() > 1):
-                self.parent._browser_sidebar._close_current_tab()
-                event.accept()
-                return True
-        elif event.type() == QEvent.Type.Close:
-            if (hasattr(self.parent, '_browser_sidebar') and 
-                self.parent._browser_sidebar.isVisible() and 
-                self.parent._browser_sidebar.tabs.count() > 1):
-                modifiers = mw.app.keyboardModifiers()
-                if modifiers & (Qt.KeyboardModifier.MetaModifier | Qt.KeyboardModifier.ControlModifier):
-                    self.parent._browser_sidebar._close_current_tab()
-                    event.ignore()
-                    return True
-        return False
-
-class BrowserCloseEventFilter(QObject):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.parent = parent
+class WindowCommandRouter(QObject):
+    """Route Ctrl+W and the window's Close command to its sidebar.
 
-    def eventFilter(self, obj, event):
-        if event.type() == QEvent.Type.Close:
-            if (hasattr(self.parent, '_browser_sidebar') and 
-                self.parent._browser_sidebar.isVisible() and 
-                self.parent._browser_sidebar.tabs.count() > 1):
-                modifiers = mw.app.keyboardModifiers()
-                if modifiers & (Qt.KeyboardModifier.MetaModifier | Qt.KeyboardModifier.ControlModifier):
-                    self.parent._browser_sidebar._close_current_tab()
-                    event.ignore()
-                    return True
-        return False
-
-class BrowserActionFilter(QObject):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.parent = parent
+    One router is installed per window by install_command_router(). Events
+    other than key presses and Close are rejected with a single set lookup.
+    """
+    _HANDLED_EVENTS = frozenset((QEvent.Type.KeyPress, QEvent.Type.Close))
+    _KEY_COMMANDS = {
+        Qt.Key.Key_W: lambda sidebar: sidebar._close_current_tab(),
+    }
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+
+    def _sidebar_with_tabs(self):
+        sidebar = getattr(self.window, '_browser_sidebar', None)
+        if sidebar is not None and sidebar.isVisible() and sidebar.tabs.count() > 1:
+            return sidebar
+        return None
 
     def eventFilter(self, obj, event):
-        if event.type() == QEvent.Type.Paint:
-            if obj.text() == "&Close" or obj.text() == "Close":
-                original_trigger = obj.triggered
-                def new_trigger(checked=False):
-                    if (hasattr(self.parent, '_browser_sidebar') and 
-                        self.parent._browser_sidebar.isVisible() and 
-                        self.parent._browser_sidebar.tabs.count() > 1):
-                        self.parent._browser_sidebar._close_current_tab()
-                    else:
-                        original_trigger.emit()
-                obj.triggered.connect(new_trigger)
+        if event.type() not in self._HANDLED_EVENTS:
+            return False
+        
+        if event.type() == QEvent.Type.Close:
+            # Ctrl+W triggers the window's Close action; close a tab instead while there are several
+            sidebar = self._sidebar_with_tabs()
+            if sidebar and mw.app.keyboardModifiers() & _COMMAND_MODIFIERS:
+                sidebar._close_current_tab()
+                event.ignore()
                 return True
-        return False
-
-def show_settings():
-    dialog = SettingsDialog(mw)
-    dialog.exec()
+            return False
+        
+        command = self._KEY_COMMANDS.get(event.key())
+        if command is None or not event.modifiers() & _COMMAND_MODIFIERS:
+            return False
+        sidebar = self._sidebar_with_tabs()
+        if sidebar is None:
+            return False
+        command(sidebar)
+        event.accept()
+        return True
+
+def install_command_router(window):
+    """Install the window's WindowCommandRouter unless it already has one."""
+    if getattr(window, '_command_router', None) is None:
+        window._command_router = WindowCommandRouter(window)
+        window.installEventFilter(window._command_router)
+    return window._command_router
 
 def show_browser_sidebar(editor, url=None):
     parent = editor.parentWindow
@@ -81,33 +68,29 @@ def show_browser_sidebar(editor, url=None):
     # Determine if this is the Browser dialog
     is_browser_dialog = parent.__class__.__name__ == "Browser"
     
-    # Helper to get main field content from selected note in Browser dialog
+    # Helper to get main field content and note type from selected note in Browser dialog
     def get_main_field_content_from_browser():
-        cfg = config.get_config()
-        main_field = cfg.get("main_field")
-        if not main_field:
-            return None
         # Try to get selected note from browser
         try:
             # parent.selectedNotes() returns a list of note ids
             selected = parent.selectedNotes()
             if not selected:
-                return None
-            note_id = selected[0]
-            note = parent.mw.col.get_note(note_id)
-            if note and main_field in note:
-                return note[main_field].strip()
+                return None, None
+            note = parent.mw.col.get_note(selected[0])
+            content, note_type_plan = config.get_note_search(note)
+            if content:
+                return content, note_type_plan.note_type
         except Exception:
-            return None
-        return None
+            return None, None
+        return None, None
 
     if hasattr(parent, '_browser_sidebar'):
         if parent._browser_sidebar.isVisible():
             if is_browser_dialog:
                 # If already open, reload with current selected note
-                content = get_main_field_content_from_browser()
+                content, note_type = get_main_field_content_from_browser()
                 if content:
-                    parent._browser_sidebar.open_search_tabs(content)
+                    parent._browser_sidebar.open_search_tabs(content, note_type)
                 else:
                     tooltip("No main field content found for selected note.")
                 return
@@ -121,9 +104,9 @@ def show_browser_sidebar(editor, url=None):
             if is_browser_dialog:
                 parent._browser_sidebar.show()
                 # Also reload with current selected note
-                content = get_main_field_content_from_browser()
+                content, note_type = get_main_field_content_from_browser()
                 if content:
-                    parent._browser_sidebar.open_search_tabs(content)
+                    parent._browser_sidebar.open_search_tabs(content, note_type)
                 else:
                     tooltip("No main field content found for selected note.")
                 return
@@ -136,43 +119,20 @@ def show_browser_sidebar(editor, url=None):
 
     # Get search query from main field and configured sites
     if is_browser_dialog:
-        content = get_main_field_content_from_browser()
+        content, note_type = get_main_field_content_from_browser()
         search_urls = []
         if content:
-            # Use the same logic as open_search_tabs to get URLs
-            cfg = config.get_config()
-            note_type_name = cfg.get("note_type")
-            main_field_name = cfg.get("main_field")
-            configurable_fields = cfg.get("configurable_fields", {}).get(note_type_name, [])
-            field_search_configs = cfg.get("field_search_configs", {}).get(note_type_name, {})
-            predefined_sites = PREDEFINED_SEARCH_SITES
-            search_content_encoded = content.strip().replace(' ', '+')
-            for field_name in configurable_fields:
-                field_config = field_search_configs.get(field_name, {})
-                for category_name, sites_config in field_config.items():
-                    if category_name in predefined_sites:
-                        for site_name, is_enabled in sites_config.items():
-                            if is_enabled and site_name in predefined_sites[category_name]:
-                                url_template = predefined_sites[category_name][site_name]
-                                placeholders = url_template.count("{}")
-                                search_url = url_template.format(*([search_content_encoded] * placeholders))
-                                search_urls.append((site_name, search_url))
+            # Use the same search plan as open_search_tabs to get URLs
+            search_urls = config.build_search_urls(content, note_type)
         else:
             tooltip("No main field content found for selected note.")
         # Continue to create the sidebar as usual
     else:
-        search_urls = _get_search_urls_for_editor(editor)
-
-    event_filter = BrowserEventFilter(parent)
-    parent.installEventFilter(event_filter)
+        search_urls, content, note_type = _get_search_urls_for_editor(editor)
 
-    close_event_filter = BrowserCloseEventFilter(parent)
-    parent.installEventFilter(close_event_filter)
-
-    for action in parent.findChildren(QAction):
-        action_filter = BrowserActionFilter(parent)
-        action.installEventFilter(action_filter)
+    install_command_router(parent)
 
+    from .browser import BrowserWidget
     browser = BrowserWidget(url=None, parent=parent)
     parent._browser_sidebar = browser
 
@@ -194,7 +154,7 @@ def show_browser_sidebar(editor, url=None):
         
         if search_urls:
             # Open all search tabs
-            browser.open_search_tabs(content)
+            browser.open_search_tabs(content, note_type)
         return
     else:
         splitter = QSplitter(Qt.Orientation.Horizontal)
@@ -211,82 +171,31 @@ def show_browser_sidebar(editor, url=None):
         main_widget.setLayout(new_layout)
         splitter.setSizes([500, 500])
         if search_urls:
-            _open_search_urls_in_browser(browser, search_urls)
+            _open_search_urls_in_browser(browser, search_urls, content, note_type)
 
 def _get_search_urls_for_editor(editor):
-    """Get the search URLs based on the current note's main field content and configured sites."""
-    cfg = config.get_config()
-    
-    # Get the current note type and main field
-    note_type_name = cfg.get("note_type")
-    main_field_name = cfg.get("main_field")
-    
-    if not note_type_name or not main_field_name:
-        return []
-    
-    # Get the main field content from the editor
+    """Get (search URLs, main field content, note type) for the current note's main field and configured sites."""
+    # Get the main field content and search plan of the editor's note type
     try:
         if hasattr(editor, 'note') and editor.note:
-            note = editor.note
-            if main_field_name in note:
-                main_field_content = note[main_field_name].strip()
-                if not main_field_content:
-                    return []
-            else:
-                return []
+            main_field_content, note_type_plan = config.get_note_search(editor.note)
+            if not main_field_content:
+                return [], None, None
         else:
-            return []
+            return [], None, None
     except:
-        return []
-    
-    # Get configured fields and their sites for this note type
-    configurable_fields = cfg.get("configurable_fields", {}).get(note_type_name, [])
-    field_search_configs = cfg.get("field_search_configs", {}).get(note_type_name, {})
-    
-    search_urls = []
+        return [], None, None
     
-    # Use predefined sites from config
-    predefined_sites = PREDEFINED_SEARCH_SITES
-    
-    # For each configured field, get the selected sites
-    for field_name in configurable_fields:
-        if field_name in field_search_configs:
-            field_config = field_search_configs[field_name]
-            for category_name, sites_config in field_config.items():
-                if category_name in predefined_sites:
-                    for site_name, is_enabled in sites_config.items():
-                        if is_enabled and site_name in predefined_sites[category_name]:
-                            url_template = predefined_sites[category_name][site_name]
-                            # Format the URL with the main field content
-                            try:
-                                placeholders = url_template.count("{}")
-                                search_url = url_template.format(*([main_field_content] * placeholders))
-                                search_urls.append((site_name, search_url))
-                            except Exception:
-                                # Handle URL formatting errors
-                                pass
-    
-    return search_urls
-
-def _open_search_urls_in_browser(browser, search_urls):
-    """Open search URLs in the browser as separate tabs."""
-    # Clear existing tabs if any and open search tabs
-    if search_urls:
-        # Clear all existing tabs
-        while browser.tabs.count() > 0:
-            browser.tabs.removeTab(0)
-        
-        # Open search tabs
-        for tab_title, search_url in search_urls:
-            new_tab = browser._add_new_tab(search_url)
-            # Set a more descriptive tab title
-            tab_index = browser.tabs.indexOf(new_tab)
-            if tab_index >= 0:
-                browser.tabs.setTabText(tab_index, tab_title[:15] + "..." if len(tab_title) > 15 else tab_title)
-
-    # If no search URLs, just open a blank tab
-    if not search_urls:
-        browser._add_new_tab()
+    search_urls = config.build_search_urls(main_field_content, plan=note_type_plan.plan)
+    return search_urls, main_field_content, note_type_plan.note_type
+
+def _open_search_urls_in_browser(browser, search_urls, content, note_type):
+    """Open search URLs in the browser as separate tabs.
+
+    The searched term goes along so the lookups use the tab and lookup caches
+    and are recorded in the history, as in the Browser dialog.
+    """
+    browser.open_urls(search_urls, term=config.normalize_term(content), note_type=note_type)
 
 def add_browser_button(buttons, editor):
     """Add Web Browser button and Reset button to editor buttons."""
@@ -346,70 +255,144 @@ def refresh_browser_search(editor):
     if not browser or not browser.isVisible():
         return
         
-    # Lấy nội dung từ Main Field
-    cfg = config.get_config()
-    main_field = cfg.get("main_field")
-    if not main_field:
-        return
-        
     # Lưu note đang mở trước khi lấy nội dung
     def after_save():
-        # Lấy nội dung từ editor sau khi đã lưu
+        # Lấy nội dung từ Main Field của loại note đang mở, sau khi đã lưu
         if hasattr(editor, 'note') and editor.note:
-            note = editor.note
-            if main_field in note:
-                main_field_content = note[main_field].strip()
-                if not main_field_content:
-                    return
-                    
-                # Hiển thị tooltip cho người dùng biết đang tìm kiếm gì
-                tooltip(f"🔍 Searching for: {main_field_content}")
+            main_field_content, note_type_plan = config.get_note_search(editor.note)
+            if not main_field_content:
+                return
                 
-                # Lấy danh sách URL cần tìm kiếm
-                search_urls = _get_search_urls_for_editor(editor)
-                if search_urls:
-                    _open_search_urls_in_browser(browser, search_urls)
+            # Hiển thị tooltip cho người dùng biết đang tìm kiếm gì
+            tooltip(f"🔍 Searching for: {main_field_content}")
+            
+            # Lấy danh sách URL cần tìm kiếm
+            search_urls = config.build_search_urls(main_field_content, plan=note_type_plan.plan)
+            if search_urls:
+                _open_search_urls_in_browser(browser, search_urls, main_field_content, note_type_plan.note_type)
     
     # Gọi saveNow với callback
     editor.saveNow(after_save)
 
-def on_browser_row_changed(browser):
+def on_browser_row_changed(browser, stats=None):
     """Auto-refresh the web browser sidebar in the Browser dialog when the note selection changes, but only if the main field content has changed."""
     # Only do this if the sidebar is open
     if not hasattr(browser, '_browser_sidebar') or not browser._browser_sidebar.isVisible():
         return
-    # Get main field content from selected note
     cfg = config.get_config()
-    main_field = cfg.get("main_field")
-    if not main_field:
-        return
     try:
         selected = browser.selected_notes()
         if not selected:
             return
         note_id = selected[0]
         note = browser.mw.col.get_note(note_id)
-        if note and main_field in note:
-            content = note[main_field].strip()
+        # Main field and plan of the note's own type, cached per notetype id
+        content, note_type_plan = config.get_note_search(note)
+        if note_type_plan is not None:
+            search = (content, note_type_plan.note_type)
             # Only refresh if content is different from last search
-            if not hasattr(browser, '_last_browser_search_content') or browser._last_browser_search_content != content:
-                browser._browser_sidebar.open_search_tabs(content)
-                browser._last_browser_search_content = content
+            if getattr(browser, '_last_browser_search', None) != search:
+                # Pages still loading for the previous note are superseded
+                cancelled = browser._browser_sidebar.cancel_loads()
+                browser._browser_sidebar.open_search_tabs(content, note_type_plan.note_type)
+                browser._last_browser_search = search
+                if stats is not None:
+                    stats["loads_cancelled"] += cancelled
+                    stats["searches_run"] += 1
+                _prefetch_neighbours(browser, cfg)
     except Exception:
         return
 
+def _prefetch_neighbours(browser, cfg):
+    """Start background lookups for the main field of the rows around the selected one."""
+    row_count = cfg.get("prefetch_rows", 0)
+    if row_count <= 0:
+        return
+    model = browser.table._model
+    current_row = browser.table._view.selectionModel().currentIndex().row()
+    if current_row < 0:
+        return
+    
+    rows = [current_row + offset for offset in range(1, row_count + 1)]
+    if cfg.get("prefetch_previous", False):
+        rows += [current_row - offset for offset in range(1, row_count + 1)]
+    
+    searches = []
+    for row in rows:
+        if not 0 <= row < model.len_rows():
+            continue
+        note_id = model.get_note_id(model.index(row, 0))
+        if note_id is None:
+            continue
+        content, note_type_plan = config.get_note_search(browser.mw.col.get_note(note_id))
+        if content:
+            searches.append((content, note_type_plan.note_type))
+    browser._browser_sidebar.prefetch(searches)
+
+class SearchScheduler(QObject):
+    """Coalesce Browser selection changes into one search per debounce window.
+
+    Every selection change restarts the timer, so only the latest selection is
+    searched; page loads still running for the superseded search are stopped
+    when the new search starts.
+    """
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self.stats = {"events_received": 0, "searches_run": 0, "loads_cancelled": 0}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run_search)
+
+    def schedule(self, *args):
+        self.stats["events_received"] += 1
+        delay = config.get_config().get("selection_debounce_ms", 150)
+        self._timer.start(max(0, int(delay)))
+
+    def _run_search(self):
+        on_browser_row_changed(self.browser, self.stats)
+
 def setup_browser_hooks(browser):
     """Setup browser hooks for auto-refresh on note selection change (no shortcut, no crash)."""
+    if getattr(browser, '_search_scheduler', None) is not None:
+        return
+    sel_model = browser.table._view.selectionModel()
+    if not sel_model:
+        return
+    browser._search_scheduler = SearchScheduler(browser)
     # Connect to row change signal using browser.table._view
-    browser.table._view.selectionModel().selectionChanged.connect(lambda: on_browser_row_changed(browser))
+    qconnect(sel_model.selectionChanged, browser._search_scheduler.schedule)
 
 # Register hooks
 gui_hooks.editor_did_init_buttons.append(add_browser_button)
 gui_hooks.editor_did_init.append(setup_editor_shortcuts)
 browser_will_show.append(setup_browser_hooks)  # Use browser_will_show instead of browser_did_load
 
+def warm_lookup_cache(browser):
+    """Look up the selected notes in the background and keep the results in the lookup cache."""
+    from .jobs import warm_cache_for_selected_notes
+    warm_cache_for_selected_notes(browser)
+
+def autofill_fields(browser):
+    """Fill fields of the selected notes from lookups of their main field."""
+    from .autofill import autofill_selected_notes
+    autofill_selected_notes(browser)
+
+def add_browser_menu_actions(browser):
+    """Add the cache warming and auto-fill commands to the Browser dialog's Notes menu."""
+    browser.form.menu_Notes.addSeparator()
+    action = QAction("Warm Lookup Cache", browser)
+    qconnect(action.triggered, lambda: warm_lookup_cache(browser))
+    browser.form.menu_Notes.addAction(action)
+    action = QAction("Auto-Fill Fields...", browser)
+    qconnect(action.triggered, lambda: autofill_fields(browser))
+    browser.form.menu_Notes.addAction(action)
+
+gui_hooks.browser_menus_did_init.append(add_browser_menu_actions)
+
 def show_settings():
     """Show settings dialog."""
+    from .settings import SettingsDialog
     dialog = SettingsDialog(mw)
     dialog.exec()
 
@@ -422,29 +405,43 @@ browser_settings_action = QAction("Better Web Browser", mw)
 browser_settings_action.triggered.connect(show_settings)
 ankivn_menu.addAction(browser_settings_action)
 
-def my_browser_hook(browser):
-    sel_model = browser.table._view.selectionModel()
-    if not sel_model:
-        return
+def show_diagnostics():
+    """Show per-site load statistics."""
+    from .diagnostics import DiagnosticsDialog
+    dialog = DiagnosticsDialog(mw)
+    dialog.exec()
 
-    def on_selection_changed(selected, deselected):
-        note_ids = browser.selected_notes()
-        if not note_ids:
-            return
-        note_id = note_ids[0]
-        cfg = config.get_config()
-        main_field = cfg.get("main_field")
-        note = browser.mw.col.get_note(note_id)
-        if note and main_field in note:
-            content = note[main_field].strip()
-            if not hasattr(browser, '_last_browser_search_content') or browser._last_browser_search_content != content:
-                if hasattr(browser, '_browser_sidebar') and browser._browser_sidebar.isVisible():
-                    browser._browser_sidebar.open_search_tabs(content)
-                browser._last_browser_search_content = content
+diagnostics_action = QAction("Better Web Browser Diagnostics", mw)
+diagnostics_action.triggered.connect(show_diagnostics)
+ankivn_menu.addAction(diagnostics_action)
+
+def _save_load_stats():
+    from . import stats
+    if stats._load_stats is not None:
+        stats._load_stats.save()
+
+gui_hooks.profile_will_close.append(_save_load_stats)
+
+def _close_lookup_cache():
+    from . import lookup_cache
+    lookup_cache.close_lookup_cache()
+
+gui_hooks.profile_will_close.append(_close_lookup_cache)
+
+def _close_history():
+    from . import history
+    history.close_history()
+
+gui_hooks.profile_will_close.append(_close_history)
+
+def _flush_config():
+    config.flush_config()
 
-    qconnect(sel_model.selectionChanged, on_selection_changed)
+gui_hooks.profile_will_close.append(_flush_config)
 
-# Register the browser hook
-browser_will_show.append(my_browser_hook)
+def _on_operation_did_execute(changes, handler):
+    # A renamed note type or field changes which plan a notetype id maps to
+    if changes.notetype:
+        config.clear_search_plans()
 
-gui_hooks.browser_will_show.append(my_browser_hook)
+gui_hooks.operation_did_execute.append(_on_operation_did_execute)
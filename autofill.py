@@ -0,0 +1,181 @@
+import copy
+import html
+from aqt import mw
+from aqt.operations.note import update_notes
+from aqt.qt import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QComboBox, QCheckBox, QDialogButtonBox, QWidget
+)
+from aqt.utils import showInfo, tooltip
+from . import config
+from .jobs import BulkLookupJob
+from .reader import EXTRACTORS
+from .sites import get_site_registry
+
+# Parts of a reader entry a field can be filled with, and their labels.
+PARTS = {"definitions": "Definitions", "ipa": "IPA", "examples": "Examples"}
+
+def format_part(entry, part):
+    """Return the field HTML for one part of a ReaderEntry, or "" when the site had none."""
+    items = getattr(entry, part)
+    if part == "ipa":
+        return html.escape(" ".join(items))
+    return "<br>".join(html.escape(item) for item in items)
+
+class AutoFillDialog(QDialog):
+    """Choose which site and part fills each field of the configured note type."""
+    def __init__(self, parent, note_type, field_names, note_count, skipped_count=0):
+        super().__init__(parent)
+        self.setWindowTitle("Auto-Fill Fields")
+        self.note_type = note_type
+        saved = config.get_config().get("autofill", {}).get(note_type, {})
+        saved_fields = saved.get("fields", {})
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(
+            f"Fill fields of {note_count} selected {note_type} notes from the main field's lookups. "
+            "Sites with an extractor give the best results; others use the page description."))
+        if skipped_count:
+            layout.addWidget(QLabel(skipped_message(skipped_count)))
+
+        form = QFormLayout()
+        # Sites with an extractor first
+        site_names = sorted(
+            get_site_registry().site_names(),
+            key=lambda site: (site not in EXTRACTORS, site))
+        self.field_combos = {}
+        for field_name in field_names:
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            site_combo = QComboBox()
+            site_combo.addItem("(don't fill)", "")
+            for site_name in site_names:
+                site_combo.addItem(site_name, site_name)
+            part_combo = QComboBox()
+            for part, label in PARTS.items():
+                part_combo.addItem(label, part)
+            field_config = saved_fields.get(field_name, {})
+            site_combo.setCurrentIndex(max(0, site_combo.findData(field_config.get("site", ""))))
+            part_combo.setCurrentIndex(max(0, part_combo.findData(field_config.get("part", "definitions"))))
+            row_layout.addWidget(site_combo, 2)
+            row_layout.addWidget(part_combo, 1)
+            form.addRow(field_name + ":", row)
+            self.field_combos[field_name] = (site_combo, part_combo)
+        layout.addLayout(form)
+
+        self.overwrite_check = QCheckBox("Overwrite fields that already have content")
+        self.overwrite_check.setChecked(saved.get("overwrite", False))
+        layout.addWidget(self.overwrite_check)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def field_sources(self):
+        """Return {field: (site, part)} for the fields that should be filled."""
+        sources = {}
+        for field_name, (site_combo, part_combo) in self.field_combos.items():
+            if site_combo.currentData():
+                sources[field_name] = (site_combo.currentData(), part_combo.currentData())
+        return sources
+
+    def accept(self):
+        cfg = copy.deepcopy(config.get_config())
+        cfg.setdefault("autofill", {})[self.note_type] = {
+            "fields": {field: {"site": site, "part": part} for field, (site, part) in self.field_sources().items()},
+            "overwrite": self.overwrite_check.isChecked(),
+        }
+        config.save_config(cfg)
+        super().accept()
+
+def skipped_message(skipped_count):
+    return (f"{skipped_count} selected notes of other note types are skipped; "
+            "select them on their own to fill them.")
+
+def autofill_selected_notes(browser):
+    """Fill fields of the selected notes from reader lookups of their main field, in one undoable update."""
+    # The note type of the first selected note with a main field is filled; other types are
+    # left alone and counted, so the dialog and the report can say so
+    notes = []
+    model = None
+    main_field = None
+    skipped_count = 0
+    for note_id in browser.selected_notes():
+        note = mw.col.get_note(note_id)
+        content, note_type_plan = config.get_note_search(note)
+        if not content:
+            continue
+        if model is not None and note.mid != model["id"]:
+            skipped_count += 1
+            continue
+        if model is None:
+            model = mw.col.models.get(note.mid)
+            main_field = note_type_plan.main_field
+        notes.append(note)
+    if not notes:
+        tooltip("No selected notes have content in the main field of their note type. "
+                "Choose main fields in the Better Web Browser settings.")
+        return
+    note_type = model["name"]
+
+    field_names = [field["name"] for field in model["flds"] if field["name"] != main_field]
+    dialog = AutoFillDialog(browser, note_type, field_names, len(notes), skipped_count)
+    if not dialog.exec():
+        return
+    sources = dialog.field_sources()
+    overwrite = dialog.overwrite_check.isChecked()
+    if not sources:
+        tooltip("No fields were chosen to fill.")
+        return
+
+    # One lookup per (site, term), shared by every note and field that needs it
+    tasks = []
+    seen = set()
+    for note in notes:
+        term = note[main_field].strip()
+        normalized = config.normalize_term(term)
+        for field_name, (site, part) in sources.items():
+            if not overwrite and note[field_name].strip():
+                continue
+            if (site, normalized) in seen:
+                continue
+            target = config.build_site_target(site, term)
+            if target is not None:
+                seen.add((site, normalized))
+                tasks.append((target, normalized))
+    if not tasks:
+        tooltip("The chosen fields already have content in every selected note.")
+        return
+
+    skipped_report = "\n" + skipped_message(skipped_count) if skipped_count else ""
+
+    def on_finished(job, cancelled):
+        if cancelled:
+            showInfo(job.report(cancelled) + "\nNo notes were changed." + skipped_report,
+                     parent=browser, title="Better Web Browser")
+            return
+        changed = []
+        for note in notes:
+            normalized = config.normalize_term(note[main_field])
+            modified = False
+            for field_name, (site, part) in sources.items():
+                if not overwrite and note[field_name].strip():
+                    continue
+                entry = job.results.get((site, normalized))
+                value = format_part(entry, part) if entry is not None else ""
+                if value and note[field_name] != value:
+                    note[field_name] = value
+                    modified = True
+            if modified:
+                changed.append(note)
+        report = job.report(cancelled) + f"\nNotes updated: {len(changed)} of {len(notes)}." + skipped_report
+        if not changed:
+            showInfo(report, parent=browser, title="Better Web Browser")
+            return
+        # Một lần ghi cho cả lô, một bước Undo
+        update_notes(parent=browser, notes=changed).success(
+            lambda _: showInfo(report, parent=browser, title="Better Web Browser")
+        ).run_in_background()
+
+    BulkLookupJob(browser, tasks, label="Looking up fields...", on_finished=on_finished).start()
@@ -0,0 +1,195 @@
+import os
+import time
+from aqt.qt import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+from . import config
+
+# Written to user_files/blocklist.txt the first time; the user edits that file afterwards.
+DEFAULT_RULES = """\
+# Better Web Browser blocklist: requests to these hosts (and their subdomains)
+# are blocked in the sidebar. One domain per line; "0.0.0.0 domain" hosts
+# lines and "||domain^" filter lines are accepted too. Lines starting with
+# "@@" allow a domain again, e.g. "@@cdn.example.com". Lines starting with
+# # or ! are comments. Changes apply within a few seconds.
+2mdn.net
+33across.com
+adnxs.com
+adsafeprotected.com
+adservice.google.com
+adsrvr.org
+amazon-adsystem.com
+bidswitch.net
+casalemedia.com
+chartbeat.com
+chartbeat.net
+criteo.com
+criteo.net
+doubleclick.net
+doubleverify.com
+googlesyndication.com
+googletagservices.com
+google-analytics.com
+googletagmanager.com
+hotjar.com
+indexww.com
+moatads.com
+openx.net
+outbrain.com
+pubmatic.com
+quantserve.com
+rubiconproject.com
+scorecardresearch.com
+sharethrough.com
+taboola.com
+teads.tv
+"""
+
+# Resource types the per-site policies can turn off, and the policy key for each.
+_POLICY_RESOURCE_TYPES = {
+    QWebEngineUrlRequestInfo.ResourceType.ResourceTypeFontResource: "fonts",
+    QWebEngineUrlRequestInfo.ResourceType.ResourceTypeMedia: "media",
+}
+
+# How often the blocklist file is checked for edits.
+RELOAD_CHECK_SECONDS = 5
+
+def parse_rules(lines):
+    """Return (blocked domains, allowed domains) as sets from blocklist lines."""
+    blocked = set()
+    allowed = set()
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in "#!":
+            continue
+        target = blocked
+        if line.startswith("@@"):
+            target = allowed
+            line = line[2:]
+        parts = line.split()
+        if len(parts) >= 2 and parts[0] in ("0.0.0.0", "127.0.0.1", "::"):
+            line = parts[1]
+        elif len(parts) != 1:
+            continue
+        domain = line.strip("|^").lower().lstrip(".")
+        if domain.startswith("*."):
+            domain = domain[2:]
+        if domain and "/" not in domain and "*" not in domain:
+            target.add(domain)
+    return blocked, allowed
+
+class DomainBlocklist:
+    """Domain-suffix matching against hash sets.
+
+    A host is blocked when it, or any parent domain of it, is in the
+    blocked set and no closer match is in the allowed set. A lookup costs
+    one set probe per label of the host, however many rules there are.
+    """
+    def __init__(self, blocked=(), allowed=()):
+        self.blocked = set(blocked)
+        self.allowed = set(allowed)
+
+    def __len__(self):
+        return len(self.blocked)
+
+    def is_blocked(self, host):
+        host = host.lower()
+        while True:
+            if host in self.allowed:
+                return False
+            if host in self.blocked:
+                return True
+            dot = host.find(".")
+            if dot < 0:
+                return False
+            host = host[dot + 1:]
+
+class BlocklistInterceptor(QWebEngineUrlRequestInterceptor):
+    """Block requests to blocklisted hosts and count them per page host.
+
+    Fonts and media are also blocked on the pages of known sites whose
+    site policy turns them off.
+    """
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.blocklist = DomainBlocklist()
+        self.enabled = config.get_config().get("blocklist_enabled", True)
+        # page host -> {"blocked": count, "hosts": {blocked host: count}}
+        self.stats = {}
+        self._stamp = None
+        self._next_check = 0
+        self.reload()
+        config.add_config_listener(self._on_config_changed)
+
+    def _on_config_changed(self, cfg):
+        self.enabled = cfg.get("blocklist_enabled", True)
+
+    def reload(self):
+        """Read the blocklist file, creating it with the default rules if it does not exist."""
+        try:
+            ensure_blocklist_file(self.path)
+            stat = os.stat(self.path)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                blocked, allowed = parse_rules(f)
+            self.blocklist = DomainBlocklist(blocked, allowed)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            print(f"Failed to load blocklist: {e}")
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_SECONDS
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_mtime_ns, stat.st_size) != self._stamp:
+            self.reload()
+
+    def interceptRequest(self, info):
+        page_host = info.firstPartyUrl().host()
+        policy_key = _POLICY_RESOURCE_TYPES.get(info.resourceType())
+        if policy_key is not None:
+            policy = config.get_host_policies().get(page_host)
+            if policy is not None and not policy[policy_key]:
+                info.block(True)
+                self._count(page_host, f"({policy_key} off)")
+                return
+        if not self.enabled:
+            return
+        self._reload_if_changed()
+        host = info.requestUrl().host()
+        if not host or not self.blocklist.is_blocked(host):
+            return
+        info.block(True)
+        self._count(page_host, host)
+
+    def _count(self, page_host, blocked_host):
+        entry = self.stats.setdefault(page_host or "(unknown)", {"blocked": 0, "hosts": {}})
+        entry["blocked"] += 1
+        entry["hosts"][blocked_host] = entry["hosts"].get(blocked_host, 0) + 1
+
+    def reset_stats(self):
+        self.stats = {}
+
+_interceptor = None
+
+def get_blocklist_path():
+    return os.path.join(config.get_user_files_dir(), "blocklist.txt")
+
+def ensure_blocklist_file(path=None):
+    """Write the default rules to the blocklist file if it does not exist yet; return its path."""
+    path = path or get_blocklist_path()
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(DEFAULT_RULES)
+    return path
+
+def get_interceptor():
+    """Return the interceptor installed on the shared profile, creating it on first use."""
+    global _interceptor
+    if _interceptor is None:
+        from aqt import mw
+        _interceptor = BlocklistInterceptor(get_blocklist_path(), mw)
+    return _interceptor
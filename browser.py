@@ -1,4 +1,10 @@
+import html
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
 from aqt.qt import (
+    QObject,
+    QTimer,
     QWidget,
     QVBoxLayout,
     QPushButton,
@@ -8,6 +14,8 @@ from aqt.qt import (
     QKeySequence,
     QTabWidget,
     QTabBar,
+    QStackedWidget,
+    QTextBrowser,
     QEvent,
     QWebEngineView,
     QWebEnginePage,
@@ -16,12 +24,69 @@ from aqt.qt import (
     Qt,
     QUrl,
 )
-from .config import PREDEFINED_SEARCH_SITES
+from aqt import mw
+from .config import MOBILE_USER_AGENT
+
+# Rough memory cost of one rendered tab, used to turn the cache budget into a tab count.
+TAB_MEMORY_ESTIMATE_MB = 60
+
+_shared_profile = None
+_script_manager = None
+
+def get_shared_profile():
+    """Return the profile shared by every tab in every window, creating it on first use."""
+    global _shared_profile, _script_manager
+    if _shared_profile is not None:
+        return _shared_profile
+
+    # Profile gắn với mw để sống lâu hơn mọi QWebEnginePage dùng nó.
+    profile = QWebEngineProfile("browser_profile", mw)
+
+    # Giả lập trình duyệt di động để các trang web (như Google)
+    # tự động gửi về phiên bản tối ưu cho màn hình hẹp.
+    profile.setHttpUserAgent(MOBILE_USER_AGENT)
+
+    profile.setPersistentCookiesPolicy(
+        QWebEngineProfile.PersistentCookiesPolicy.ForcePersistentCookies)
+
+    settings = profile.settings()
+    settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
+    settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptCanAccessClipboard, True)
+
+    # Chặn quảng cáo và tracker theo blocklist (user_files/blocklist.txt).
+    from .blocklist import get_interceptor
+    profile.setUrlRequestInterceptor(get_interceptor())
+
+    # Viewport và CSS ẩn quảng cáo được chèn khi tạo document, trước lần vẽ đầu tiên.
+    from .scripts import UserScriptManager
+    _script_manager = UserScriptManager(profile)
+    _script_manager.install()
+
+    _shared_profile = profile
+    return profile
 
 class TabWidget(QWidget):
-    def __init__(self, url=None, parent=None, browser=None):
+    # Number of QWebEngineViews that have been created and not yet destroyed.
+    live_views = 0
+
+    def __init__(self, url=None, parent=None, browser=None, lazy=False):
         super().__init__(parent)
         self.browser = browser
+        # Title of the search this tab was opened for; None for tabs the user opened.
+        self.site_key = None
+        # Normalised search term and URL of that search, used by the recent tab cache.
+        self.term = None
+        self.search_url = url
+        self.load_ok = False
+        # True while this tab was loaded by BrowserWidget.prefetch() and not yet shown.
+        self.prefetched = False
+        # When the tab was last the current tab, for TabLifecycleManager.
+        self.last_active = time.monotonic()
+        # Site and category of the search, for per-site load statistics.
+        self.site = None
+        self.category = None
+        self._load_requested_at = None
+        self._load_marks = {}
         
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
@@ -54,6 +119,14 @@ class TabWidget(QWidget):
         self.url_edit.setAlignment(Qt.AlignmentFlag.AlignLeft)
         nav_layout.addWidget(self.url_edit)
 
+        self.reader_button = QPushButton("≡", self)
+        self.reader_button.clicked.connect(lambda: self.browser.show_reader() if self.browser else None)
+        self.reader_button.setMaximumWidth(30)
+        self.reader_button.setToolTip("Reader View")
+        from .config import get_config
+        self.reader_button.setVisible(bool(get_config().get("reader_mode", False)))
+        nav_layout.addWidget(self.reader_button)
+
         self.new_tab_button = QPushButton("+", self)
         self.new_tab_button.clicked.connect(lambda: self.browser._add_new_tab() if self.browser else None)
         self.new_tab_button.setMaximumWidth(30)
@@ -62,61 +135,109 @@ class TabWidget(QWidget):
         
         layout.addLayout(nav_layout)
         
-        self.profile = QWebEngineProfile("browser_profile")
-        
-        # Giả lập trình duyệt di động để các trang web (như Google)
-        # tự động gửi về phiên bản tối ưu cho màn hình hẹp.
-        self.profile.setHttpUserAgent("Mozilla/5.0 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.91 Mobile Safari/537.36")
-        
-        self.profile.setPersistentCookiesPolicy(
-            QWebEngineProfile.PersistentCookiesPolicy.ForcePersistentCookies)
-        
-        settings = self.profile.settings()
-        settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, True)
-        settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptCanAccessClipboard, True)
-        
-        self.webview = QWebEngineView(self)
-        self.webpage = QWebEnginePage(self.profile, self.webview)
-        self.webview.setPage(self.webpage)
-        
-        self.webview.urlChanged.connect(self._url_changed)
-        self.webview.loadFinished.connect(self._on_load_finished)
+        self.profile = get_shared_profile()
         
-        # Kết nối tín hiệu loadFinished với hàm inject viewport mới
-        self.webview.loadFinished.connect(self.inject_viewport_on_load)
+        # A lazy tab is only a placeholder holding its URL; the web view is
+        # created the first time the tab is activated (see materialize()).
+        self.webview = None
+        self.webpage = None
+        self.loading = False
+        # If no URL is provided, load a default page or leave it blank
+        self.pending_url = url or "about:blank"
+        self.url_edit.setText(url or "")
         
-        if url:
-            self.webview.load(QUrl(url))
-            self.url_edit.setText(url)
-        else:
-            # If no URL is provided, load a default page or leave it blank
-            self.webview.load(QUrl("about:blank")) 
-            self.url_edit.setText("")
-        
-        layout.addWidget(self.webview)
+        if not lazy:
+            self.materialize()
 
         QShortcut(QKeySequence("Ctrl+["), self).activated.connect(self._go_back)
         QShortcut(QKeySequence("Ctrl+]"), self).activated.connect(self._go_forward)
 
-    def inject_viewport_on_load(self, ok):
-        """Inject hoặc ép buộc thẻ meta viewport để đảm bảo layout responsive."""
-        if not ok:
-            return
+    def is_materialized(self):
+        return self.webview is not None
+
+    def materialize(self):
+        """Create the web view if this is still a placeholder, then load any pending URL."""
+        if self.webview is None:
+            self.webview = QWebEngineView(self)
+            self.webpage = QWebEnginePage(self.profile, self.webview)
+            self.webview.setPage(self.webpage)
+            TabWidget.live_views += 1
+            self.webview.destroyed.connect(TabWidget._view_destroyed)
+            
+            self.webview.urlChanged.connect(self._url_changed)
+            self.webview.loadStarted.connect(self._on_load_started)
+            self.webview.loadProgress.connect(self._on_load_progress)
+            self.webview.loadFinished.connect(self._on_load_finished)
             
-        # Script này sẽ tìm thẻ viewport có sẵn và ép nó theo ý muốn,
-        # hoặc tạo mới nếu chưa có. Hiệu quả hơn với các trang phức tạp.
-        script = """
-        var viewport = document.querySelector("meta[name=viewport]");
-        if (viewport) {
-            viewport.setAttribute('content', 'width=device-width, initial-scale=1.0');
-        } else {
-            var meta = document.createElement('meta');
-            meta.name = 'viewport';
-            meta.content = 'width=device-width, initial-scale=1.0';
-            document.getElementsByTagName('head')[0].appendChild(meta);
-        }
+            if self.browser:
+                self.webview.titleChanged.connect(lambda title: self.browser._update_tab_title(self, title))
+            
+            self.layout().addWidget(self.webview)
+        
+        if self.pending_url:
+            url, self.pending_url = self.pending_url, None
+            self._load_requested_at = time.perf_counter()
+            self._load_marks = {}
+            self._apply_site_policy()
+            self.webview.load(QUrl(url))
+
+    def _apply_site_policy(self):
+        """Turn images and JavaScript on or off for this page according to its site's policy.
+
+        Fonts and media are blocked by the profile's request interceptor instead.
         """
-        self.webpage.runJavaScript(script)
+        from .config import get_site_policy
+        policy = get_site_policy(self.site)
+        settings = self.webpage.settings()
+        settings.setAttribute(QWebEngineSettings.WebAttribute.AutoLoadImages, policy["images"])
+        settings.setAttribute(QWebEngineSettings.WebAttribute.JavascriptEnabled, policy["javascript"])
+
+    @staticmethod
+    def _view_destroyed(*args):
+        TabWidget.live_views -= 1
+
+    def stop_loading(self):
+        """Stop an in-flight page load; return True if there was one."""
+        if not self.webview or not self.loading:
+            return False
+        # A cancelled load is not a failure of the site; don't record it
+        self._load_requested_at = None
+        self.webview.stop()
+        self.loading = False
+        return True
+
+    def set_pending_url(self, url):
+        """Point this tab at a new URL; it is loaded on the next materialize()."""
+        # Không để trang cũ tiếp tục tải khi tab đã chuyển sang từ khóa mới.
+        self.stop_loading()
+        self.pending_url = url
+        self.search_url = url
+        self.load_ok = False
+        self.url_edit.setText(url)
+        self.url_edit.setCursorPosition(0)
+
+    def set_lifecycle_state(self, state):
+        """Move the page to a QWebEnginePage.LifecycleState; placeholders are left alone."""
+        if self.webpage is not None and self.webpage.lifecycleState() != state:
+            self.webpage.setLifecycleState(state)
+
+    def lifecycle_label(self):
+        if self.webpage is None:
+            return "Not loaded"
+        return {
+            QWebEnginePage.LifecycleState.Active: "Active",
+            QWebEnginePage.LifecycleState.Frozen: "Frozen",
+            QWebEnginePage.LifecycleState.Discarded: "Discarded",
+        }.get(self.webpage.lifecycleState(), "Unknown")
+
+    def dispose(self):
+        """Stop loading and delete this tab together with its web view and page."""
+        if self.webview:
+            self.webview.stop()
+            self.webview.deleteLater()
+            self.webview = None
+            self.webpage = None
+        self.deleteLater()
 
     def _reset_search(self):
         """Reset the search by re-searching the main field content"""
@@ -124,18 +245,17 @@ class TabWidget(QWidget):
             editor = self.browser.parent.editor
             if editor and hasattr(editor, 'note'):
                 from . import config
-                cfg = config.get_config()
-                main_field = cfg.get("main_field")
-                if main_field and main_field in editor.note:
-                    content = editor.note[main_field].strip()
-                    if content:
-                        self.browser.open_search_tabs(content)
+                content, note_type_plan = config.get_note_search(editor.note)
+                if content:
+                    self.browser.open_search_tabs(content, note_type_plan.note_type)
 
     def _go_back(self):
-        self.webview.back()
+        if self.webview:
+            self.webview.back()
 
     def _go_forward(self):
-        self.webview.forward()
+        if self.webview:
+            self.webview.forward()
     
     def _navigate_to_url(self):
         url = self.url_edit.text().strip()
@@ -150,7 +270,10 @@ class TabWidget(QWidget):
         else:
             url = 'https://www.google.com/search?q=' + url.replace(' ', '+')
             
-        self.webview.setUrl(QUrl(url))
+        # Pages the user navigates to are not timed as the search site
+        self.site = None
+        self.pending_url = url
+        self.materialize()
     
     def _url_changed(self, url):
         self.url_edit.setText(url.toString())
@@ -161,18 +284,131 @@ class TabWidget(QWidget):
             self.parent().setTabText(index, title[:20] + "..." if len(title) > 20 else title)
 
     def _reload_page(self):
-        self.webview.reload()
+        if self.webview:
+            self.webview.reload()
+        else:
+            self.materialize()
 
     def focus_web_content(self):
-        self.webview.setFocus()
+        if self.webview:
+            self.webview.setFocus()
 
     def current_url(self):
-        return self.webview.url().toString()
+        if self.webview:
+            return self.webview.url().toString()
+        return self.pending_url or ""
+
+    def _elapsed_ms(self):
+        return int((time.perf_counter() - self._load_requested_at) * 1000)
+
+    def _on_load_started(self):
+        self.loading = True
+        if self._load_requested_at is not None:
+            self._load_marks.setdefault("started", self._elapsed_ms())
+
+    def _on_load_progress(self, progress):
+        if self._load_requested_at is None:
+            return
+        from .stats import PROGRESS_MILESTONES
+        for milestone in PROGRESS_MILESTONES:
+            if progress >= milestone and milestone not in self._load_marks:
+                self._load_marks[milestone] = self._elapsed_ms()
+
+    def _record_load(self, ok):
+        from .stats import get_load_stats
+        marks = self._load_marks
+        started_ms = marks.pop("started", None)
+        get_load_stats().record(self.site, self.category, started_ms, marks, self._elapsed_ms(), ok)
 
     def _on_load_finished(self, ok):
+        self.loading = False
+        self.load_ok = ok
+        # Only loads requested by a search are timed, not links followed inside the page
+        if self._load_requested_at is not None and self.site:
+            self._record_load(ok)
+            if ok and not self.prefetched:
+                from .history import record_page_load
+                record_page_load(self.term, self.site, self.search_url, self.webview.title())
+        self._load_requested_at = None
         if ok:
             self.focus_web_content()
 
+class TabLifecycleManager(QObject):
+    """Freeze and then discard the background pages of a BrowserWidget.
+
+    Pages that have not been the current tab for freeze_after_seconds are
+    frozen, and discarded after discard_after_seconds. When the rendered pages
+    (open tabs and the recent tab cache) would exceed memory_budget_mb, the
+    least recently used ones are discarded early. A page becomes Active again
+    when its tab is selected; a discarded page then reloads its URL.
+    """
+    SWEEP_INTERVAL_MS = 10000
+    _STATE_ORDER = (
+        QWebEnginePage.LifecycleState.Active,
+        QWebEnginePage.LifecycleState.Frozen,
+        QWebEnginePage.LifecycleState.Discarded,
+    )
+
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.sweep)
+        self._timer.start(self.SWEEP_INTERVAL_MS)
+        browser.tabs.currentChanged.connect(self._on_current_changed)
+
+    def _on_current_changed(self, index):
+        tab = self.browser.tabs.widget(index)
+        if tab is not None:
+            tab.last_active = time.monotonic()
+            tab.set_lifecycle_state(QWebEnginePage.LifecycleState.Active)
+        self.update_tooltips()
+
+    def _advance(self, tab, state):
+        # Pages only move towards Discarded here; selecting the tab makes them Active again
+        current = tab.webpage.lifecycleState()
+        if self._STATE_ORDER.index(state) > self._STATE_ORDER.index(current):
+            tab.set_lifecycle_state(state)
+
+    def sweep(self):
+        from . import config
+        cfg = config.get_config()
+        if not cfg.get("lifecycle_enabled", True):
+            return
+        freeze_after = cfg.get("freeze_after_seconds", 120)
+        discard_after = cfg.get("discard_after_seconds", 600)
+        budget_views = max(1, int(cfg.get("memory_budget_mb", 800)) // TAB_MEMORY_ESTIMATE_MB)
+        
+        tabs = self.browser.tabs
+        current = tabs.currentWidget()
+        background = [tabs.widget(i) for i in range(tabs.count())] + list(self.browser._tab_cache.values())
+        background = [tab for tab in background if tab is not current and tab.is_materialized() and not tab.loading]
+        
+        now = time.monotonic()
+        for tab in background:
+            age = now - tab.last_active
+            if age >= discard_after:
+                self._advance(tab, QWebEnginePage.LifecycleState.Discarded)
+            elif age >= freeze_after:
+                self._advance(tab, QWebEnginePage.LifecycleState.Frozen)
+        
+        # The current tab always counts against the budget
+        rendered = [tab for tab in background
+                    if tab.webpage.lifecycleState() != QWebEnginePage.LifecycleState.Discarded]
+        excess = len(rendered) + 1 - budget_views
+        if excess > 0:
+            rendered.sort(key=lambda tab: tab.last_active)
+            for tab in rendered[:excess]:
+                self._advance(tab, QWebEnginePage.LifecycleState.Discarded)
+        
+        self.update_tooltips()
+
+    def update_tooltips(self):
+        tabs = self.browser.tabs
+        for i in range(tabs.count()):
+            tab = tabs.widget(i)
+            tabs.setTabToolTip(i, f"{tab.current_url()}\nState: {tab.lifecycle_label()}")
+
 class BrowserWidget(QWidget):
     def __init__(self, url=None, parent=None):
         super().__init__(parent)
@@ -189,8 +425,54 @@ class BrowserWidget(QWidget):
         self.tabs.setElideMode(Qt.TextElideMode.ElideRight)
         self.tabs.tabBar().setExpanding(False)
         self.tabs.tabCloseRequested.connect(self._close_tab)
+        self.tabs.currentChanged.connect(self._materialize_around)
+        
+        # Note type of the tabs last opened, reused when a history match is searched again.
+        self.note_type = None
+        
+        # Placeholders are not materialized while open_urls() rebuilds the tab list.
+        self._rebuilding = False
+        self._eager_tab_count = 0
         
-        layout.addWidget(self.tabs)
+        # Recently shown search tabs, keyed by (normalised term, tab title), oldest first.
+        self._tab_cache = OrderedDict()
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        
+        # Neighbour prefetch: queued (term, target) pairs and the hidden tabs loading them.
+        self._prefetch_queue = deque()
+        self._prefetching = {}
+        self.prefetch_stats = {"issued": 0, "hits": 0}
+        
+        self.lifecycle = TabLifecycleManager(self)
+        
+        # Reader mode: the extracted text of every site in one light view;
+        # the full tabs stay unloaded until a site is opened from it.
+        self.reader = QTextBrowser()
+        self.reader.setOpenLinks(False)
+        self.reader.anchorClicked.connect(self._open_full_page)
+        self._reader_entries = []
+        self._reader_generation = 0
+        
+        # Search box over the lookup history; results replace the tabs while it has text.
+        self.history_edit = QLineEdit()
+        self.history_edit.setPlaceholderText("Search lookup history...")
+        self.history_edit.setClearButtonEnabled(True)
+        self.history_edit.textChanged.connect(self._on_history_text_changed)
+        self.history_view = QTextBrowser()
+        self.history_view.setOpenLinks(False)
+        self.history_view.anchorClicked.connect(self._open_history_match)
+        self._history_matches = []
+        self._page_before_history = None
+        self._history_timer = QTimer(self)
+        self._history_timer.setSingleShot(True)
+        self._history_timer.timeout.connect(self._search_history)
+        layout.addWidget(self.history_edit)
+        
+        self.stack = QStackedWidget()
+        self.stack.addWidget(self.tabs)
+        self.stack.addWidget(self.reader)
+        self.stack.addWidget(self.history_view)
+        layout.addWidget(self.stack)
         
         QShortcut(QKeySequence("Ctrl+T"), self).activated.connect(lambda: self._add_new_tab())
         QShortcut(QKeySequence("Ctrl+L"), self).activated.connect(self._focus_url_current)
@@ -217,13 +499,19 @@ class BrowserWidget(QWidget):
 
     def _close_tab(self, index):
         if self.tabs.count() > 1:
+            tab = self.tabs.widget(index)
             self.tabs.removeTab(index)
+            tab.dispose()
         else:
             self.hide()
 
     def _close_current_tab(self):
         self._close_tab(self.tabs.currentIndex())
 
+    def cancel_loads(self):
+        """Stop every page that is still loading; return how many were stopped."""
+        return sum(1 for i in range(self.tabs.count()) if self.tabs.widget(i).stop_loading())
+
     def _next_tab(self):
         curr = self.tabs.currentIndex()
         self.tabs.setCurrentIndex((curr + 1) % self.tabs.count())
@@ -257,63 +545,355 @@ class BrowserWidget(QWidget):
         super().showEvent(event)
         self.focus_web_content()
 
-    def _add_new_tab(self, url=None):
+    def _materialize_around(self, index):
+        """Materialize the tab at index plus the configured number of tabs after it."""
+        if self._rebuilding or index < 0 or self.stack.currentWidget() is not self.tabs:
+            return
+        last = min(index + self._eager_tab_count, self.tabs.count() - 1)
+        for i in range(index, last + 1):
+            self.tabs.widget(i).materialize()
+
+    def _add_new_tab(self, url=None, lazy=False, select=True):
         # If no url is provided to _add_new_tab, TabWidget will handle it (e.g. load about:blank)
-        new_tab = TabWidget(url, self.tabs, browser=self)
+        new_tab = TabWidget(url, self.tabs, browser=self, lazy=lazy)
         index = self.tabs.addTab(new_tab, "New Tab")
-        self.tabs.setCurrentIndex(index)
-        new_tab.webview.titleChanged.connect(lambda title: self._update_tab_title(new_tab, title))
-        if not url:
-            new_tab.url_edit.setFocus()
-            new_tab.url_edit.selectAll()
+        if select:
+            self.stack.setCurrentWidget(self.tabs)
+            self.tabs.setCurrentIndex(index)
+            if not url:
+                new_tab.url_edit.setFocus()
+                new_tab.url_edit.selectAll()
         return new_tab
 
-    def open_search_tabs(self, search_content):
-        """Open multiple search tabs based on configured fields and sites"""
+    def is_reader_shown(self):
+        return self.stack.currentWidget() is self.reader
+
+    def show_reader(self):
+        self.stack.setCurrentWidget(self.reader)
+
+    def _on_history_text_changed(self, text):
+        if not text.strip():
+            self._history_timer.stop()
+            if self.stack.currentWidget() is self.history_view:
+                self.stack.setCurrentWidget(self._page_before_history or self.tabs)
+                self._materialize_around(self.tabs.currentIndex())
+            return
+        if self.stack.currentWidget() is not self.history_view:
+            self._page_before_history = self.stack.currentWidget()
+            self.stack.setCurrentWidget(self.history_view)
+        self._history_timer.start(150)
+
+    def _search_history(self):
+        """Show the past lookups matching the history search box."""
+        from .history import get_history
+        query = self.history_edit.text()
+        try:
+            self._history_matches = get_history().search(query)
+        except Exception as e:
+            print(f"Lookup history search failed: {e}")
+            self._history_matches = []
+        if not self._history_matches:
+            self.history_view.setHtml(f"<p>No past lookups match {html.escape(query)}.</p>")
+            return
+        parts = []
+        for index, match in enumerate(self._history_matches):
+            looked_up = datetime.fromtimestamp(match.looked_up).strftime("%Y-%m-%d %H:%M")
+            parts.append(
+                f'<p><b><a href="history:{index}">{html.escape(match.term)}</a></b> '
+                f'<span style="color: gray;">{html.escape(match.site)} · {looked_up}</span><br>'
+                f'{html.escape(match.snippet or "")}</p>')
+        self.history_view.setHtml("".join(parts))
+
+    def _open_history_match(self, url):
+        """Search again for the term of a past lookup that was clicked."""
+        if url.scheme() != "history":
+            return
+        try:
+            match = self._history_matches[int(url.path())]
+        except (ValueError, IndexError):
+            return
+        self.open_search_tabs(match.term, self.note_type)
+
+    def _leave_history(self):
+        self._history_timer.stop()
+        self.history_edit.blockSignals(True)
+        self.history_edit.clear()
+        self.history_edit.blockSignals(False)
+
+    def _start_reader(self, term, search_urls):
+        """Look up every search page in the background and show the results in the reader view.
+
+        Entries are served from the on-disk lookup cache when the search has a
+        normalised term and the cache is enabled (a TTL above zero days).
+        """
+        from . import config, reader
+        cfg = config.get_config()
+        cache = None
+        ttl_days = max(0, int(cfg.get("lookup_cache_ttl_days", 30)))
+        if term and ttl_days:
+            from .lookup_cache import get_lookup_cache
+            cache = get_lookup_cache()
+        max_bytes = max(0, int(cfg.get("lookup_cache_size_mb", 50))) * 1024 * 1024
+        
+        self._reader_generation += 1
+        generation = self._reader_generation
+        self._reader_entries = []
+        self.reader.setHtml("<p>Looking up…</p>")
+        self.show_reader()
+
+        def on_done(future):
+            if generation != self._reader_generation:
+                # A newer search replaced this one while it was running
+                return
+            try:
+                entries = future.result()
+            except Exception as e:
+                print(f"Reader lookup failed: {e}")
+                return
+            self._reader_entries = entries
+            self.reader.setHtml(reader.render_html(term, entries))
+            from .history import record_reader_entries
+            record_reader_entries(term, entries)
+
+        mw.taskman.run_in_background(
+            lambda: reader.lookup(search_urls, term, cache, ttl_days * 86400, max_bytes), on_done)
+
+    def _open_full_page(self, url):
+        """Leave the reader view for the full tab of the site whose title was clicked."""
+        if url.scheme() != "full":
+            return
+        try:
+            entry = self._reader_entries[int(url.path())]
+        except (ValueError, IndexError):
+            return
+        self.stack.setCurrentWidget(self.tabs)
+        for i in range(self.tabs.count()):
+            if self.tabs.widget(i).site_key == entry.title:
+                self.tabs.setCurrentIndex(i)
+                self._materialize_around(i)
+                break
+
+    def open_search_tabs(self, search_content, note_type=None):
+        """Open multiple search tabs based on the configured fields and sites of a note type.
+
+        The note type last shown in the settings is used when none is given.
+        """
         if not search_content or not search_content.strip():
             return
             
         from . import config
-        cfg = config.get_config()
-        note_type = cfg.get("note_type")
-        
-        if not note_type:
+        if not note_type and not config.get_config().get("note_type"):
             return
             
-        # Get configured fields and their search sites
-        configurable_fields = cfg.get("configurable_fields", {}).get(note_type, [])
-        field_search_configs = cfg.get("field_search_configs", {}).get(note_type, {})
+        search_urls = config.build_search_urls(search_content, note_type)
         
-        search_urls = []
-        search_content_encoded = search_content.strip().replace(' ', '+')
+        self.open_urls(search_urls, term=config.normalize_term(search_content), note_type=note_type)
+
+    def prefetch(self, searches):
+        """Load the search tabs for upcoming notes in hidden tabs and keep them in the tab cache.
+
+        searches holds a (search content, note type) pair per note.
+
+        Earlier queued prefetches that have not started yet are dropped. At most
+        prefetch_concurrency hidden tabs load at the same time. Prefetching needs
+        the recent tab cache, since that is where the loaded tabs are kept.
+        """
+        from . import config
+        cfg = config.get_config()
+        cache_size = max(0, int(cfg.get("tab_cache_budget_mb", 0))) // TAB_MEMORY_ESTIMATE_MB
+        self._prefetch_queue.clear()
+        if not cache_size:
+            return
         
-        # Collect all search URLs from configured fields
-        for field_name in configurable_fields:
-            field_config = field_search_configs.get(field_name, {})
-            
-            for category_name, sites_config in field_config.items():
-                if category_name in PREDEFINED_SEARCH_SITES:
-                    for site_name, is_enabled in sites_config.items():
-                        if is_enabled and site_name in PREDEFINED_SEARCH_SITES[category_name]:
-                            url_template = PREDEFINED_SEARCH_SITES[category_name][site_name]
-                            placeholders = url_template.count("{}")
-                            search_url = url_template.format(*([search_content_encoded] * placeholders))
-                            search_urls.append((f"{site_name} - {field_name}", search_url))
-        
-        # Clear existing tabs if any and open search tabs
-        if search_urls:
-            # Clear all existing tabs
-            while self.tabs.count() > 0:
-                self.tabs.removeTab(0)
-            
-            # Open search tabs
-            for tab_title, search_url in search_urls:
-                new_tab = self._add_new_tab(search_url)
-                # Set a more descriptive tab title
-                tab_index = self.tabs.indexOf(new_tab)
-                if tab_index >= 0:
-                    self.tabs.setTabText(tab_index, tab_title[:15] + "..." if len(tab_title) > 15 else tab_title)
+        shown_terms = {self.tabs.widget(i).term for i in range(self.tabs.count())}
+        for search_content, note_type in searches:
+            if not search_content or not search_content.strip():
+                continue
+            term = config.normalize_term(search_content)
+            if term in shown_terms:
+                continue
+            for target in config.build_search_urls(search_content, note_type):
+                key = (term, target.title)
+                if key not in self._tab_cache and key not in self._prefetching:
+                    self._prefetch_queue.append((term, target))
+        self._pump_prefetch()
+
+    def _pump_prefetch(self):
+        from . import config
+        concurrency = max(1, int(config.get_config().get("prefetch_concurrency", 2)))
+        while self._prefetch_queue and len(self._prefetching) < concurrency:
+            term, target = self._prefetch_queue.popleft()
+            tab = TabWidget(target.url, self, browser=self, lazy=True)
+            tab.hide()
+            tab.site_key = target.title
+            tab.term = term
+            tab.site = target.site
+            tab.category = target.category
+            tab.prefetched = True
+            self._prefetching[(term, target.title)] = tab
+            tab.materialize()
+            tab.webview.loadFinished.connect(lambda ok, tab=tab: self._on_prefetch_finished(tab, ok))
+            self.prefetch_stats["issued"] += 1
+
+    def _on_prefetch_finished(self, tab, ok):
+        key = (tab.term, tab.site_key)
+        if self._prefetching.get(key) is not tab:
+            # Already adopted by open_urls() or replaced
+            return
+        del self._prefetching[key]
+        
+        from . import config
+        cache_size = max(0, int(config.get_config().get("tab_cache_budget_mb", 0))) // TAB_MEMORY_ESTIMATE_MB
+        if ok and cache_size:
+            self._cache_tab(tab, cache_size)
+        else:
+            tab.dispose()
+        self._pump_prefetch()
+
+    def _set_search_tab_title(self, tab, tab_title, search_url):
+        tab_index = self.tabs.indexOf(tab)
+        if tab_index >= 0:
+            self.tabs.setTabText(tab_index, tab_title[:15] + "..." if len(tab_title) > 15 else tab_title)
+            self.tabs.setTabToolTip(tab_index, search_url)
+
+    def _take_cached_tab(self, term, target):
+        key = (term, target.title)
+        tab = self._tab_cache.pop(key, None)
+        if tab is None:
+            # A prefetch still loading this tab is adopted as it is
+            tab = self._prefetching.pop(key, None)
+        if tab is None:
+            self.cache_stats["misses"] += 1
+            return None
+        if tab.search_url != target.url:
+            # The site's URL template changed since the tab was cached
+            tab.dispose()
+            self.cache_stats["misses"] += 1
+            return None
+        tab.set_lifecycle_state(QWebEnginePage.LifecycleState.Active)
+        self.cache_stats["hits"] += 1
+        if tab.prefetched:
+            tab.prefetched = False
+            self.prefetch_stats["hits"] += 1
+            self._pump_prefetch()
+        return tab
+
+    def _stash_tab(self, tab, cache_size):
+        """Move a fully loaded search tab out of the tab bar into the recent tab cache."""
+        if tab.term is None or tab.site_key is None or not tab.is_materialized() or not tab.load_ok:
+            return False
+        self.tabs.removeTab(self.tabs.indexOf(tab))
+        self._cache_tab(tab, cache_size)
+        return True
+
+    def _cache_tab(self, tab, cache_size):
+        tab.hide()
+        tab.set_lifecycle_state(QWebEnginePage.LifecycleState.Frozen)
         
+        key = (tab.term, tab.site_key)
+        replaced = self._tab_cache.pop(key, None)
+        if replaced is not None:
+            replaced.dispose()
+        self._tab_cache[key] = tab
+        self._trim_tab_cache(cache_size)
+
+    def _trim_tab_cache(self, cache_size):
+        while len(self._tab_cache) > cache_size:
+            _, tab = self._tab_cache.popitem(last=False)
+            tab.dispose()
+            self.cache_stats["evictions"] += 1
+
+    def open_urls(self, search_urls, term=None, note_type=None):
+        """Show one tab per SearchTarget, reusing the tabs that are already open.
+
+        Tabs are matched by title: a tab opened earlier for the same site and
+        field is re-navigated in place, new titles get new tabs and tabs that
+        are no longer wanted are disposed of together with their web views.
+        With lazy tabs enabled only the first tab (and the configured number
+        of tabs after it) loads right away; the rest load when activated.
+        In reader mode no tab loads: the pages are fetched as plain HTML and
+        their extracted text is shown in the reader view instead.
+
+        When a normalised search term is given and the recent tab cache has a
+        budget, loaded tabs of the previous term are frozen and kept instead
+        of being re-navigated, and tabs cached for this term are swapped back
+        in without reloading.
+
+        note_type is the note type the search URLs were built for; it is kept
+        so a past lookup clicked in the history is searched with its sites.
+        """
+        self.note_type = note_type
         # If no search URLs, just open a blank tab
         if not search_urls:
             self._add_new_tab()
+            return
+        
+        from . import config
+        cfg = config.get_config()
+        lazy = cfg.get("lazy_tabs", True)
+        self._leave_history()
+        self._eager_tab_count = max(0, int(cfg.get("eager_tab_count", 0)))
+        cache_size = max(0, int(cfg.get("tab_cache_budget_mb", 0))) // TAB_MEMORY_ESTIMATE_MB
+        if term is None:
+            cache_size = 0
+        self._trim_tab_cache(cache_size)
+        
+        existing = {}
+        for i in range(self.tabs.count()):
+            tab = self.tabs.widget(i)
+            if tab.site_key is not None and tab.site_key not in existing:
+                existing[tab.site_key] = tab
+        
+        self._rebuilding = True
+        try:
+            wanted = []
+            for target in search_urls:
+                tab = self._take_cached_tab(term, target) if cache_size else None
+                if tab is not None:
+                    self.tabs.addTab(tab, target.title)
+                else:
+                    tab = existing.pop(target.title, None)
+                    if tab is not None and cache_size and tab.term != term and self._stash_tab(tab, cache_size):
+                        tab = None
+                    if tab is None:
+                        tab = self._add_new_tab(target.url, lazy=True, select=False)
+                        tab.site_key = target.title
+                    else:
+                        tab.set_pending_url(target.url)
+                tab.term = term
+                tab.site = target.site
+                tab.category = target.category
+                # Set a more descriptive tab title
+                self._set_search_tab_title(tab, target.title, target.url)
+                wanted.append(tab)
+            
+            # Cache or dispose of every tab that is not part of the new search
+            wanted_ids = {id(tab) for tab in wanted}
+            for i in reversed(range(self.tabs.count())):
+                tab = self.tabs.widget(i)
+                if id(tab) not in wanted_ids and not (cache_size and self._stash_tab(tab, cache_size)):
+                    self.tabs.removeTab(i)
+                    tab.dispose()
+            
+            # Put the remaining tabs in search order
+            tab_bar = self.tabs.tabBar()
+            for i, tab in enumerate(wanted):
+                current_index = self.tabs.indexOf(tab)
+                if current_index != i:
+                    tab_bar.moveTab(current_index, i)
+        finally:
+            self._rebuilding = False
+        
+        reader_mode = cfg.get("reader_mode", False)
+        if reader_mode:
+            self._start_reader(term, search_urls)
+        else:
+            self.stack.setCurrentWidget(self.tabs)
+        
+        self.tabs.setCurrentIndex(0)
+        if lazy:
+            self._materialize_around(0)
+        elif not reader_mode:
+            for tab in wanted:
+                tab.materialize()
+        self.lifecycle.update_tooltips()
@@ -1,6 +1,12 @@
+import atexit
 import json
 import os
+from collections import namedtuple
+from urllib.parse import quote
 from aqt import mw
+from aqt.qt import QCoreApplication, QTimer
+
+MOBILE_USER_AGENT = "Mozilla/5.0 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.91 Mobile Safari/537.36"
 
 PREDEFINED_SEARCH_SITES = {
     "English": {
@@ -41,8 +47,37 @@ PREDEFINED_SEARCH_SITES = {
     }
 }
 
-def get_config_path():
-    """Return the path to the addon's configuration file."""
+# One precompiled search site: the tab title, where the site comes from and its URL template.
+SearchPlanEntry = namedtuple("SearchPlanEntry", ["title", "site", "category", "field", "template", "placeholders"])
+
+# What to search for notes of one note type: its name, the field searched and its plan.
+NoteTypePlan = namedtuple("NoteTypePlan", ["note_type", "main_field", "plan"])
+
+# One search ready to open: the tab title, the final URL and the site it belongs to.
+SearchTarget = namedtuple("SearchTarget", ["title", "url", "site", "category", "field"])
+
+# Resources a site's tabs may load; every one is allowed unless site_policies turns it off.
+SITE_POLICY_KEYS = ("images", "javascript", "fonts", "media")
+
+_search_plans = {}  # note type name -> tuple of SearchPlanEntry
+_note_type_plans = {}  # notetype id -> NoteTypePlan, or None when the note type is not searched
+_host_policies = None  # host of a site with a policy -> merged site policy, see get_host_policies()
+
+_config_path = None  # Resolved once by get_config_path()
+_config_cache = None  # Parsed config.json shared by every get_config() caller
+_config_stamp = None  # (mtime_ns, size) of config.json when _config_cache was loaded
+_config_listeners = []  # Callables run with the new config after it changes
+_pending_save = None  # Config saved by save_config() but not written to disk yet
+_save_timer = None  # Single-shot QTimer that writes _pending_save
+
+# Version of the config.json layout written by this add-on, see migrate_config().
+CONFIG_VERSION = 3
+
+# How long save_config() waits for more saves before writing config.json.
+SAVE_DELAY_MS = 500
+
+def get_addon_dir():
+    """Return the addon's folder."""
     mgr = mw.addonManager
 
     try:
@@ -73,29 +108,124 @@ def get_config_path():
         # Ultimate fallback: use the directory of this file
         addon_dir = os.path.dirname(__file__)
 
-    return os.path.join(addon_dir, "config.json")
+    return addon_dir
+
+def get_config_path():
+    """Return the path to the addon's configuration file, resolving it only once."""
+    global _config_path
+    if _config_path is None:
+        _config_path = os.path.join(get_addon_dir(), "config.json")
+    return _config_path
+
+def get_user_files_dir():
+    """Return the add-on's user_files folder (kept by Anki across add-on updates), creating it if needed."""
+    user_files_dir = os.path.join(os.path.dirname(get_config_path()), "user_files")
+    os.makedirs(user_files_dir, exist_ok=True)
+    return user_files_dir
+
+def add_config_listener(callback):
+    """Call callback(config) every time the configuration is saved or reloaded from disk."""
+    if callback not in _config_listeners:
+        _config_listeners.append(callback)
+
+def remove_config_listener(callback):
+    if callback in _config_listeners:
+        _config_listeners.remove(callback)
+
+def _notify_config_changed(config):
+    for callback in list(_config_listeners):
+        try:
+            callback(config)
+        except Exception as e:
+            print(f"Config listener failed: {e}")
+
+def _config_file_stamp(config_path):
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
 
 def get_default_config():
     """Get default configuration."""
     return {
-        "note_type": "",  # Selected note type
-        "main_field": "",  # Main field for search
+        "note_type": "",  # Note type last shown in the settings, searched when no note is given
+        "main_fields": {},  # Note type -> field whose content is searched; types without one are not searched
         "refresh_shortcut": "Ctrl+R",  # Default refresh shortcut
+        "config_version": CONFIG_VERSION,  # Layout of this file, upgraded by migrate_config()
         "configurable_fields": {},  # Fields that can show web content
-        "field_search_configs": {}  # Search configurations for each field
+        "enabled_sites": {},  # Note type -> {field: [site ids searched for the field, in tab order]}
+        "lazy_tabs": True,  # Only load a search tab when it is activated
+        "eager_tab_count": 0,  # Background tabs after the active one to load right away
+        "reader_mode": False,  # Show extracted text of all sites instead of rendering each page
+        "lookup_cache_ttl_days": 30,  # Days a reader lookup stays cached on disk; 0 turns the cache off
+        "lookup_cache_size_mb": 50,  # Disk space for cached lookups, least recently used dropped first
+        "blocklist_enabled": True,  # Block ad and tracker requests listed in user_files/blocklist.txt
+        "autofill": {},  # Note type -> {"fields": {field: {"site": site, "part": part}}, "overwrite": bool}
+        "site_css": {},  # Site name -> CSS injected into its pages before first paint
+        "site_policies": {},  # Site name -> {"images"/"javascript"/"fonts"/"media": False} to turn resources off
+        "history_enabled": True,  # Keep every completed lookup in a searchable history
+        "bulk_lookup_concurrency": 4,  # Worker threads used when warming the lookup cache
+        "bulk_lookup_site_rate_per_minute": 60,  # Requests per minute to one site when warming the cache
+        "selection_debounce_ms": 150,  # Quiet time after a Browser selection change before searching
+        "tab_cache_budget_mb": 300,  # Memory allowed for recently shown tabs kept for quick return
+        "prefetch_rows": 0,  # Browser rows after the selected one to look up in the background
+        "prefetch_previous": False,  # Also prefetch the rows before the selected one
+        "prefetch_concurrency": 2,  # Hidden prefetch tabs allowed to load at the same time
+        "lifecycle_enabled": True,  # Freeze and discard background tabs
+        "freeze_after_seconds": 120,  # Freeze a background tab after this long unused
+        "discard_after_seconds": 600,  # Discard a background tab after this long unused
+        "memory_budget_mb": 800  # Memory allowed for all rendered tabs of one sidebar
     }
 
 def get_config():
-    """Get current configuration."""
+    """Get current configuration.
+
+    The parsed file is cached and only read again when its mtime or size
+    changes. The returned dict is shared by all callers, so copy it
+    (copy.deepcopy) before modifying it.
+    """
+    global _config_cache, _config_stamp
     config_path = get_config_path()
+    stamp = _config_file_stamp(config_path)
     
-    if not os.path.exists(config_path):
-        return get_default_config()
-        
+    # A save waiting to be written is newer than the file
+    if _config_cache is not None and (_pending_save is not None or stamp == _config_stamp):
+        return _config_cache
+    
+    if stamp is None:
+        config = get_default_config()
+    else:
+        config = _load_config_file(config_path)
+        # The file is rewritten when it had to be migrated
+        stamp = _config_file_stamp(config_path)
+    
+    reloaded = _config_cache is not None
+    _config_cache, _config_stamp = config, stamp
+    if reloaded:
+        _notify_config_changed(config)
+    return config
+
+def _load_config_file(config_path):
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
 
+        if config.get("config_version", 1) < CONFIG_VERSION:
+            old_config = config
+            config = migrate_config(config)
+            # The migrated config is used even if it cannot be written back;
+            # migration then simply runs again on the next load.
+            try:
+                if "field_search_configs" in old_config or old_config.get("main_field"):
+                    # Keep the old file once, in case the add-on is downgraded
+                    backup_path = config_path[:-len(".json")] + f".v{old_config.get('config_version', 1)}.json"
+                    if not os.path.exists(backup_path):
+                        _write_config_file(backup_path, old_config)
+                _write_config_file(config_path, config)
+            except Exception as e:
+                print(f"Failed to save migrated configuration: {e}")
+
         # Ensure all required keys exist
         default_config = get_default_config()
         for key in default_config:
@@ -107,8 +237,103 @@ def get_config():
         print(f"Failed to load configuration: {e}")
         return get_default_config()
 
-def save_config(config):
-    """Save configuration to file."""
+def migrate_config(config):
+    """Upgrade a config.json written by an older version of the add-on to CONFIG_VERSION.
+
+    Version 1 stored field_search_configs, {note type: {field: {category:
+    {site name: enabled}}}} with an entry for every known site. Version 2
+    stores enabled_sites, {note type: {field: [site id]}} with only the
+    enabled sites. Sites the registry no longer knows are dropped.
+    Version 3 replaces the single main_field of note_type with main_fields,
+    {note type: field}, so every note type can be searched.
+    """
+    config = dict(config)
+    if config.get("config_version", 1) < 2:
+        from .sites import get_site_registry
+        registry = get_site_registry()
+        enabled_sites = {}
+        for note_type, field_configs in config.pop("field_search_configs", {}).items():
+            for field_name, field_config in field_configs.items():
+                site_ids = []
+                for category_name, sites_config in field_config.items():
+                    for site_name, is_enabled in sites_config.items():
+                        if not is_enabled:
+                            continue
+                        entry = registry.get(category_name, site_name)
+                        if entry is None:
+                            print(f"Config migration: dropping unknown site {site_name} ({category_name})")
+                        elif entry.id not in site_ids:
+                            site_ids.append(entry.id)
+                if site_ids:
+                    enabled_sites.setdefault(note_type, {})[field_name] = site_ids
+        config["enabled_sites"] = enabled_sites
+    if config.get("config_version", 1) < 3:
+        main_field = config.pop("main_field", "")
+        main_fields = dict(config.get("main_fields", {}))
+        if config.get("note_type") and main_field:
+            main_fields.setdefault(config["note_type"], main_field)
+        config["main_fields"] = main_fields
+    config["config_version"] = CONFIG_VERSION
+    return config
+
+def _write_config_file(path, config):
+    """Write config as JSON to a temporary file next to path and rename it over path.
+
+    Readers see either the old or the new file, never a partly written one.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=1, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def save_config(config, delay_ms=SAVE_DELAY_MS):
+    """Make config the current configuration and write it to disk shortly.
+
+    Listeners and get_config() see the new config at once. The file is
+    written delay_ms later, so a burst of saves costs one write; 0 writes
+    right away. Returns False only when an immediate write failed.
+    """
+    global _config_cache, _pending_save, _save_timer
+    _config_cache = config
+    _pending_save = config
+    _notify_config_changed(config)
+    if delay_ms <= 0 or QCoreApplication.instance() is None:
+        # Without an event loop the timer would never fire
+        return flush_config()
+    if _save_timer is None:
+        _save_timer = QTimer()
+        _save_timer.setSingleShot(True)
+        _save_timer.timeout.connect(_flush_delayed_save)
+    _save_timer.start(delay_ms)
+    return True
+
+def _flush_delayed_save():
+    # Nobody waits for the result of a delayed save, so a failure is shown here
+    if not flush_config():
+        try:
+            from aqt.utils import tooltip
+            tooltip("Better Web Browser could not save its settings to config.json.", period=6000)
+        except Exception:
+            pass
+
+def flush_config():
+    """Write a save_config() that is still waiting; return False if writing failed.
+
+    After a failed write the config stays current in memory, but get_config()
+    goes back to checking config.json, so fixing or editing the file is seen.
+    """
+    global _config_stamp, _pending_save
+    if _save_timer is not None:
+        try:
+            _save_timer.stop()
+        except RuntimeError:
+            # Qt already deleted the timer (at interpreter exit)
+            pass
+    if _pending_save is None:
+        return True
+    config = _pending_save
     config_path = get_config_path()
     
     try:
@@ -117,18 +342,173 @@ def save_config(config):
         if not os.path.exists(config_dir):
             os.makedirs(config_dir, exist_ok=True)
             
-        # Try to write the config
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
+        _write_config_file(config_path, config)
         
         print(f"Configuration saved successfully to: {config_path}")
+        _pending_save = None
+        _config_stamp = _config_file_stamp(config_path)
         return True
     except PermissionError as e:
         print(f"Permission denied when saving configuration: {e}")
         print(f"Config path: {config_path}")
-        return False
     except Exception as e:
         print(f"Failed to save configuration: {e}")
         print(f"Config path: {config_path}")
-        print(f"Config data: {config}")
-        return False
\ No newline at end of file
+    _pending_save = None
+    return False
+
+# Anki closing without profile_will_close (e.g. a crash in another add-on) should not lose a save
+atexit.register(flush_config)
+
+def compile_search_plan(cfg, note_type, sites=None):
+    """Flatten the enabled sites of every configurable field into a tuple of SearchPlanEntry.
+
+    Site ids are resolved through the site registry, which reads only the
+    packs they belong to, unless sites gives a {site id: SiteEntry} mapping
+    to use instead.
+    """
+    configurable_fields = cfg.get("configurable_fields", {}).get(note_type, [])
+    enabled_sites = cfg.get("enabled_sites", {}).get(note_type, {})
+    if sites is None:
+        from .sites import get_site_registry
+        resolve = get_site_registry().get_by_id
+    else:
+        resolve = sites.get
+
+    plan = []
+    for field_name in configurable_fields:
+        seen = set()
+        for site_id in enabled_sites.get(field_name, ()):
+            entry = resolve(site_id)
+            # An overridden id and its overriding id resolve to the same site; one tab is enough
+            if entry is not None and entry.id not in seen:
+                seen.add(entry.id)
+                plan.append(SearchPlanEntry(
+                    f"{entry.name} - {field_name}", entry.name, entry.category, field_name,
+                    entry.url, entry.url.count("{}")))
+    return tuple(plan)
+
+def get_search_plan(note_type=None):
+    """Return the compiled search plan for a note type (the configured one by default).
+
+    Plans are cached until the configuration changes.
+    """
+    # get_config() also notices edits made to config.json outside the add-on
+    cfg = get_config()
+    if note_type is None:
+        note_type = cfg.get("note_type")
+    if not note_type:
+        return ()
+
+    plan = _search_plans.get(note_type)
+    if plan is None:
+        plan = compile_search_plan(cfg, note_type)
+        _search_plans[note_type] = plan
+    return plan
+
+def get_note_type_plan(mid):
+    """Return the NoteTypePlan for a notetype id, or None when notes of that type are not searched.
+
+    Resolved once per id and kept until the configuration or the note types
+    change, so looking up the plan of each note in a mixed selection is a
+    dict lookup.
+    """
+    # get_config() also notices edits made to config.json outside the add-on
+    cfg = get_config()
+    try:
+        return _note_type_plans[mid]
+    except KeyError:
+        pass
+
+    note_type_plan = None
+    model = mw.col.models.get(mid) if mw.col else None
+    if model:
+        note_type = model["name"]
+        main_field = cfg.get("main_fields", {}).get(note_type)
+        if main_field and any(field["name"] == main_field for field in model["flds"]):
+            note_type_plan = NoteTypePlan(note_type, main_field, get_search_plan(note_type))
+    _note_type_plans[mid] = note_type_plan
+    return note_type_plan
+
+def get_note_search(note):
+    """Return (main field content, NoteTypePlan) for a note, or ("", None) when it has nothing to search."""
+    note_type_plan = get_note_type_plan(note.mid)
+    if note_type_plan is None:
+        return "", None
+    return note[note_type_plan.main_field].strip(), note_type_plan
+
+def normalize_term(search_content):
+    """Return the search content with whitespace collapsed and case folded, for use as a cache key."""
+    return " ".join(search_content.split()).casefold()
+
+def build_search_urls(search_content, note_type=None, plan=None):
+    """Return a SearchTarget for every site in the search plan, with the content percent-encoded."""
+    if not search_content or not search_content.strip():
+        return []
+    if plan is None:
+        plan = get_search_plan(note_type)
+
+    encoded = quote(search_content.strip(), safe="")
+    return [
+        SearchTarget(entry.title, entry.template.format(*([encoded] * entry.placeholders)),
+                     entry.site, entry.category, entry.field)
+        for entry in plan
+    ]
+
+def get_site_policy(site, cfg=None):
+    """Return {resource: allowed} for a site, with every resource allowed unless configured otherwise."""
+    if cfg is None:
+        cfg = get_config()
+    policy = dict.fromkeys(SITE_POLICY_KEYS, True)
+    if site:
+        policy.update(cfg.get("site_policies", {}).get(site, {}))
+    return policy
+
+def get_host_policies():
+    """Return {host: policy} for the hosts of sites that turn a resource off.
+
+    Sites sharing a host (e.g. Cambridge Dictionary and Cambridge Việt) are
+    merged: a resource is allowed on the host if any of them allows it.
+    Hosts missing from the result allow everything.
+    """
+    global _host_policies
+    if _host_policies is None:
+        from .sites import get_site_registry
+        registry = get_site_registry()
+        cfg = get_config()
+        policies = {}
+        for site_name, site_policy in cfg.get("site_policies", {}).items():
+            if all(site_policy.get(key, True) for key in SITE_POLICY_KEYS):
+                continue
+            for entry in registry.find_by_name(site_name):
+                if not entry.host or entry.host in policies:
+                    continue
+                merged = dict.fromkeys(SITE_POLICY_KEYS, False)
+                for name in registry.site_names_on_host(entry.host):
+                    policy = get_site_policy(name, cfg)
+                    for key in SITE_POLICY_KEYS:
+                        merged[key] = merged[key] or policy[key]
+                policies[entry.host] = merged
+        _host_policies = policies
+    return _host_policies
+
+def build_site_target(site_name, search_content):
+    """Return the SearchTarget of one known site for the content, or None for an unknown site."""
+    from .sites import get_site_registry
+    for entry in get_site_registry().find_by_name(site_name):
+        encoded = quote(search_content.strip(), safe="")
+        url = entry.url.format(*([encoded] * entry.url.count("{}")))
+        return SearchTarget(site_name, url, site_name, entry.category, None)
+    return None
+
+def clear_search_plans():
+    """Forget the compiled plans and host policies, e.g. after the site registry or note types changed."""
+    global _host_policies
+    _search_plans.clear()
+    _note_type_plans.clear()
+    _host_policies = None
+
+def _clear_search_plans(config):
+    clear_search_plans()
+
+add_config_listener(_clear_search_plans)
@@ -0,0 +1,192 @@
+from aqt.qt import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTabWidget, QTableWidget, QTableWidgetItem,
+    QPushButton, QLabel, QHeaderView, QDialogButtonBox, QWidget, QFormLayout, QApplication
+)
+from .lookup_cache import get_lookup_cache
+from .stats import get_load_stats, histogram_labels
+
+def _format_ms(ms):
+    return "" if ms is None else f"{ms:,}"
+
+def _open_window_stats(attribute, stats_attribute):
+    """Sum a stats dict over the open windows that have the given object, e.g. a SearchScheduler."""
+    totals = {}
+    for window in QApplication.topLevelWidgets():
+        owner = getattr(window, attribute, None)
+        if owner is None:
+            continue
+        for key, value in getattr(owner, stats_attribute).items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+class DiagnosticsDialog(QDialog):
+    """Show per-site page load statistics collected by the sidebar tabs."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Better Web Browser Diagnostics")
+        self.setMinimumWidth(900)
+        self.setMinimumHeight(450)
+
+        layout = QVBoxLayout(self)
+        self.sections = QTabWidget()
+        layout.addWidget(self.sections)
+
+        self.sections.addTab(self._build_load_stats_page(), "Page Loads")
+        self.sections.addTab(self._build_lookup_cache_page(), "Lookup Cache")
+        self.sections.addTab(self._build_sidebar_page(), "Sidebar")
+        self.sections.addTab(self._build_blocked_page(), "Blocked Requests")
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+        self.refresh()
+
+    def _build_load_stats_page(self):
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+
+        page_layout.addWidget(QLabel(
+            "Time from requesting a search page until it finished loading, per site. "
+            "Times are in milliseconds; the histogram counts successful loads."))
+
+        self.load_table = QTableWidget()
+        headers = ["Site", "Category", "Loads", "Failed", "Median", "P90", "25% progress"]
+        headers += histogram_labels()
+        self.load_table.setColumnCount(len(headers))
+        self.load_table.setHorizontalHeaderLabels(headers)
+        self.load_table.verticalHeader().setVisible(False)
+        self.load_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.load_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        page_layout.addWidget(self.load_table)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        reset_button = QPushButton("Reset Statistics")
+        reset_button.clicked.connect(self._reset_load_stats)
+        buttons_layout.addWidget(reset_button)
+        page_layout.addLayout(buttons_layout)
+        return page
+
+    def _build_lookup_cache_page(self):
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.addWidget(QLabel(
+            "Reader mode lookups kept on disk. Counts are for this session; "
+            "entries and size are what is stored now."))
+
+        form = QFormLayout()
+        self.cache_labels = {}
+        for key, label in (("hits", "Hits"), ("misses", "Misses"), ("expired", "Expired (counted as misses)"),
+                           ("evictions", "Evictions"), ("writes", "Writes"), ("entries", "Entries"),
+                           ("size", "Size")):
+            self.cache_labels[key] = QLabel()
+            form.addRow(label + ":", self.cache_labels[key])
+        page_layout.addLayout(form)
+        page_layout.addStretch()
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        clear_button = QPushButton("Clear Cache")
+        clear_button.clicked.connect(self._clear_lookup_cache)
+        buttons_layout.addWidget(clear_button)
+        page_layout.addLayout(buttons_layout)
+        return page
+
+    def _build_sidebar_page(self):
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.addWidget(QLabel(
+            "Counts for the windows open now; they start at zero when a window is opened."))
+
+        form = QFormLayout()
+        self.sidebar_labels = {}
+        for key, label in (("events_received", "Browser selection changes"),
+                           ("searches_run", "Searches run"),
+                           ("loads_cancelled", "Page loads cancelled"),
+                           ("issued", "Prefetched tabs loaded"),
+                           ("hits", "Prefetched tabs shown"),
+                           ("hit_rate", "Prefetch hit rate")):
+            self.sidebar_labels[key] = QLabel()
+            form.addRow(label + ":", self.sidebar_labels[key])
+        page_layout.addLayout(form)
+        page_layout.addStretch()
+        return page
+
+    def _build_blocked_page(self):
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        self.blocked_label = QLabel()
+        page_layout.addWidget(self.blocked_label)
+
+        self.blocked_table = QTableWidget()
+        headers = ["Page host", "Blocked requests", "Most blocked hosts"]
+        self.blocked_table.setColumnCount(len(headers))
+        self.blocked_table.setHorizontalHeaderLabels(headers)
+        self.blocked_table.verticalHeader().setVisible(False)
+        self.blocked_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.blocked_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.blocked_table.horizontalHeader().setStretchLastSection(True)
+        page_layout.addWidget(self.blocked_table)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        reset_button = QPushButton("Reset Counts")
+        reset_button.clicked.connect(self._reset_blocked_stats)
+        buttons_layout.addWidget(reset_button)
+        page_layout.addLayout(buttons_layout)
+        return page
+
+    def refresh(self):
+        rows = get_load_stats().summary()
+        self.load_table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            values = [
+                row["site"], row["category"], str(row["loads"]), str(row["failures"]),
+                _format_ms(row["median_ms"]), _format_ms(row["p90_ms"]), _format_ms(row["first_progress_ms"]),
+            ]
+            values += [str(count) for count in row["histogram"]]
+            for column, value in enumerate(values):
+                self.load_table.setItem(i, column, QTableWidgetItem(value))
+
+        cache = get_lookup_cache()
+        for key, value in cache.stats.items():
+            self.cache_labels[key].setText(f"{value:,}")
+        entries, size = cache.summary()
+        self.cache_labels["entries"].setText(f"{entries:,}")
+        self.cache_labels["size"].setText(f"{size / 1024:,.1f} KB")
+
+        scheduler_stats = _open_window_stats('_search_scheduler', 'stats')
+        for key in ("events_received", "searches_run", "loads_cancelled"):
+            self.sidebar_labels[key].setText(f"{scheduler_stats.get(key, 0):,}")
+        prefetch_stats = _open_window_stats('_browser_sidebar', 'prefetch_stats')
+        issued, hits = prefetch_stats.get("issued", 0), prefetch_stats.get("hits", 0)
+        self.sidebar_labels["issued"].setText(f"{issued:,}")
+        self.sidebar_labels["hits"].setText(f"{hits:,}")
+        self.sidebar_labels["hit_rate"].setText(f"{hits / issued:.0%}" if issued else "")
+
+        from .blocklist import get_interceptor
+        interceptor = get_interceptor()
+        self.blocked_label.setText(
+            f"Requests blocked this session by the {len(interceptor.blocklist):,} rules in blocklist.txt, "
+            "per page that made them. Blocked requests are never sent, so their size is unknown.")
+        rows = sorted(interceptor.stats.items(), key=lambda item: -item[1]["blocked"])
+        self.blocked_table.setRowCount(len(rows))
+        for i, (page_host, entry) in enumerate(rows):
+            top_hosts = sorted(entry["hosts"].items(), key=lambda item: -item[1])[:5]
+            values = [page_host, str(entry["blocked"]), ", ".join(f"{host} ({count})" for host, count in top_hosts)]
+            for column, value in enumerate(values):
+                self.blocked_table.setItem(i, column, QTableWidgetItem(value))
+
+    def _reset_load_stats(self):
+        get_load_stats().reset()
+        self.refresh()
+
+    def _reset_blocked_stats(self):
+        from .blocklist import get_interceptor
+        get_interceptor().reset_stats()
+        self.refresh()
+
+    def _clear_lookup_cache(self):
+        get_lookup_cache().clear()
+        self.refresh()
@@ -0,0 +1,151 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from . import config
+
+# Records written in one transaction, and how long the writer waits to fill a batch.
+BATCH_SIZE = 200
+BATCH_DELAY_SECONDS = 1.0
+
+# One search result: what was looked up where and when, with the matching text.
+HistoryMatch = namedtuple("HistoryMatch", ["term", "site", "url", "looked_up", "snippet"])
+
+_STOP = object()
+
+class LookupHistory:
+    """Every completed lookup (term, site, URL, time, extracted text) in a SQLite database.
+
+    record() only queues; a writer thread inserts the queued records in
+    batches. When SQLite has FTS5 the text is indexed for search(),
+    otherwise search() falls back to LIKE.
+    """
+    def __init__(self, path):
+        self.path = path
+        db = self._connect()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            "id INTEGER PRIMARY KEY, term TEXT NOT NULL, site TEXT NOT NULL, url TEXT NOT NULL, "
+            "looked_up REAL NOT NULL, text TEXT NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS lookups_looked_up ON lookups (looked_up)")
+        try:
+            db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS lookups_fts USING fts5("
+                "term, text, content='lookups', content_rowid='id')")
+            db.execute(
+                "CREATE TRIGGER IF NOT EXISTS lookups_fts_insert AFTER INSERT ON lookups BEGIN "
+                "INSERT INTO lookups_fts (rowid, term, text) VALUES (new.id, new.term, new.text); END")
+            db.execute(
+                "CREATE TRIGGER IF NOT EXISTS lookups_fts_delete AFTER DELETE ON lookups BEGIN "
+                "INSERT INTO lookups_fts (lookups_fts, rowid, term, text) "
+                "VALUES ('delete', old.id, old.term, old.text); END")
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"Lookup history: FTS5 not available, searching with LIKE ({e})")
+            self.fts = False
+        db.commit()
+        # Read connection for search(), used from the UI thread
+        self._db = db
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="LookupHistoryWriter", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def record(self, term, site, url, text):
+        self._queue.put((term, site, url, time.time(), text))
+
+    def _write_loop(self):
+        db = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_DELAY_SECONDS
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [record for record in batch if record is not _STOP]
+            if not batch:
+                continue
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO lookups (term, site, url, looked_up, text) VALUES (?, ?, ?, ?, ?)", batch)
+            except Exception as e:
+                print(f"Failed to write lookup history: {e}")
+        db.close()
+
+    def search(self, query, limit=50):
+        """Return the latest HistoryMatches whose term or text contains every word of query."""
+        words = query.split()
+        if not words:
+            return []
+        if self.fts:
+            # Each word is quoted so FTS5 syntax in the query is taken literally, and prefix matched
+            match = " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+            rows = self._db.execute(
+                "SELECT l.term, l.site, l.url, l.looked_up, snippet(lookups_fts, 1, '[', ']', '…', 12) "
+                "FROM lookups_fts JOIN lookups l ON l.id = lookups_fts.rowid "
+                "WHERE lookups_fts MATCH ? ORDER BY l.looked_up DESC LIMIT ?", (match, limit)).fetchall()
+        else:
+            conditions = " AND ".join("(term LIKE ? ESCAPE '\\' OR text LIKE ? ESCAPE '\\')" for _ in words)
+            params = []
+            for word in words:
+                pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                params += [pattern, pattern]
+            rows = self._db.execute(
+                f"SELECT term, site, url, looked_up, substr(text, 1, 120) FROM lookups WHERE {conditions} "
+                "ORDER BY looked_up DESC LIMIT ?", params + [limit]).fetchall()
+        return [HistoryMatch(*row) for row in rows]
+
+    def close(self):
+        """Write what is still queued and close the database."""
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._db.close()
+
+_history = None
+
+def get_history():
+    """Return the add-on wide LookupHistory, opening user_files/history.sqlite on first use."""
+    global _history
+    if _history is None:
+        _history = LookupHistory(os.path.join(config.get_user_files_dir(), "history.sqlite"))
+    return _history
+
+def close_history():
+    global _history
+    if _history is not None:
+        _history.close()
+        _history = None
+
+def record_reader_entries(term, entries):
+    """Record the reader entries of one lookup that succeeded."""
+    if not term or not config.get_config().get("history_enabled", True):
+        return
+    history = get_history()
+    for entry in entries:
+        if entry.error:
+            continue
+        text = "\n".join(entry.ipa + entry.definitions + entry.examples)
+        history.record(term, entry.site, entry.url, text)
+
+def record_page_load(term, site, url, title):
+    """Record a search tab that finished loading; the page title stands in for its text."""
+    if not term or not site or not config.get_config().get("history_enabled", True):
+        return
+    get_history().record(term, site, url, title or "")
@@ -0,0 +1,196 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aqt import mw
+from aqt.qt import QObject, QProgressDialog, QTimer, Qt
+from aqt.utils import showInfo, tooltip
+from . import config, reader
+from .lookup_cache import get_lookup_cache
+
+PROGRESS_INTERVAL_MS = 100
+
+class JobCancelled(Exception):
+    pass
+
+class SiteRateLimiter:
+    """Space out requests to the same site by at least 60 / requests_per_minute seconds.
+
+    Shared by all worker threads; a waiting thread gives up when the
+    cancel event is set.
+    """
+    def __init__(self, requests_per_minute, cancel_event):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0
+        self.cancel_event = cancel_event
+        self._lock = threading.Lock()
+        self._next_slot = {}  # site -> monotonic time the next request may start
+
+    def wait(self, site):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(site, now))
+            self._next_slot[site] = slot + self.interval
+        if self.cancel_event.wait(max(0, slot - time.monotonic())):
+            raise JobCancelled()
+
+def warm_cache_tasks(searches):
+    """Return one (SearchTarget, normalised term) per enabled site and distinct term.
+
+    searches holds (term, note type) pairs; each term is looked up on the sites of its note type.
+    """
+    tasks = []
+    seen = set()
+    for term, note_type in searches:
+        normalized = config.normalize_term(term)
+        for target in config.build_search_urls(term, note_type):
+            # Fields searching the same site share one lookup
+            if (target.site, normalized) not in seen:
+                seen.add((target.site, normalized))
+                tasks.append((target, normalized))
+    return tasks
+
+class BulkLookupJob(QObject):
+    """Run many reader lookups in the background, going through the lookup cache.
+
+    tasks is a list of (SearchTarget, normalised term). Lookups run on a
+    bounded thread pool; requests to one site are rate limited. Progress is
+    polled from the UI thread into a QProgressDialog whose Cancel button
+    stops the job. Successful entries are kept in results, keyed by
+    (site, term); on_finished(job, cancelled) runs when the job ends, and
+    by default shows the throughput report.
+    """
+    def __init__(self, parent, tasks, label="Warming the lookup cache...", on_finished=None):
+        super().__init__(parent)
+        cfg = config.get_config()
+        self.tasks = tasks
+        self.label = label
+        self.on_finished = on_finished
+        self.results = {}
+        self.ttl_seconds = max(0, int(cfg.get("lookup_cache_ttl_days", 30))) * 86400
+        self.max_bytes = max(0, int(cfg.get("lookup_cache_size_mb", 50))) * 1024 * 1024
+        self.cache = get_lookup_cache() if self.ttl_seconds else None
+        self.concurrency = max(1, int(cfg.get("bulk_lookup_concurrency", 4)))
+        self.cancel_event = threading.Event()
+        self.rate_limiter = SiteRateLimiter(int(cfg.get("bulk_lookup_site_rate_per_minute", 60)), self.cancel_event)
+        self.stats = {"done": 0, "fetched": 0, "cached": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+        self._pool = None
+        self._started = None
+
+        self.progress = QProgressDialog(label, "Cancel", 0, len(self.tasks), parent)
+        self.progress.setWindowTitle("Better Web Browser")
+        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress.setMinimumDuration(0)
+        self.progress.canceled.connect(self.cancel)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._update_progress)
+
+    def start(self):
+        self._started = time.monotonic()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        for target, term in self.tasks:
+            self._pool.submit(self._run_task, target, term)
+        self._timer.start(PROGRESS_INTERVAL_MS)
+        self.progress.show()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _run_task(self, target, term):
+        if self.cancel_event.is_set():
+            return
+        fetched = []
+
+        def before_fetch(site):
+            self.rate_limiter.wait(site)
+            fetched.append(site)
+
+        entry = None
+        try:
+            entry = reader.lookup_target(target, term, self.cache, self.ttl_seconds, self.max_bytes,
+                                         before_fetch=before_fetch)
+        except Exception as e:
+            print(f"Bulk lookup of {target.site} for {term!r} failed: {e}")
+        finally:
+            # Every task is counted, or the progress dialog would wait for it forever
+            self._count_task(target, term, entry, fetched)
+
+    def _count_task(self, target, term, entry, fetched):
+        with self._stats_lock:
+            self.stats["done"] += 1
+            if entry is None or entry.error:
+                self.stats["failed"] += 1
+                return
+            if self.cancel_event.is_set():
+                return
+            self.results[(target.site, term)] = entry
+            if fetched:
+                self.stats["fetched"] += 1
+            else:
+                self.stats["cached"] += 1
+
+    def _update_progress(self):
+        with self._stats_lock:
+            done = self.stats["done"]
+        finished = done >= len(self.tasks)
+        if self.cancel_event.is_set() or finished:
+            self._finish()
+            return
+        self.progress.setValue(done)
+        self.progress.setLabelText(f"{self.label} {done} of {len(self.tasks)} lookups")
+
+    def _finish(self):
+        self._timer.stop()
+        cancelled = self.cancel_event.is_set()
+        # Queued lookups are dropped; running ones stop at their next rate limit wait
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.progress.canceled.disconnect(self.cancel)
+        self.progress.close()
+        if self.on_finished is not None:
+            self.on_finished(self, cancelled)
+        else:
+            showInfo(self.report(cancelled), parent=self.parent(), title="Better Web Browser")
+        self.deleteLater()
+
+    def report(self, cancelled=False):
+        elapsed = max(time.monotonic() - self._started, 0.001)
+        stats = self.stats
+        lines = [
+            "Cancelled." if cancelled else "Finished.",
+            f"{stats['done']} of {len(self.tasks)} lookups in {elapsed:.1f} s "
+            f"({stats['done'] / elapsed:.1f} lookups/s).",
+            f"Fetched: {stats['fetched']}, already cached: {stats['cached']}, "
+            f"failed: {stats['failed']}.",
+        ]
+        return "\n".join(lines)
+
+def warm_cache_for_selected_notes(browser):
+    """Start a BulkLookupJob for the main field of the notes selected in the Browser dialog."""
+    cfg = config.get_config()
+    if not cfg.get("main_fields"):
+        tooltip("Choose a main field for a note type in the Better Web Browser settings first.")
+        return
+    if int(cfg.get("lookup_cache_ttl_days", 30)) <= 0:
+        tooltip("The lookup cache is turned off in the Better Web Browser settings.")
+        return
+
+    searches = []
+    seen = set()
+    for note_id in browser.selected_notes():
+        # Each note is searched with the main field and sites of its own note type
+        term, note_type_plan = config.get_note_search(mw.col.get_note(note_id))
+        if not term:
+            continue
+        key = (config.normalize_term(term), note_type_plan.note_type)
+        if key not in seen:
+            seen.add(key)
+            searches.append((term, note_type_plan.note_type))
+    if not searches:
+        tooltip("No main field content found in the selected notes.")
+        return
+
+    job = BulkLookupJob(browser, warm_cache_tasks(searches))
+    if not job.tasks:
+        tooltip("No search sites are enabled for the note types of the selected notes.")
+        job.deleteLater()
+        return
+    job.start()
@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from . import config
+
+class LookupCache:
+    """Extracted reader entries on disk, keyed by (site, normalised term).
+
+    Entries older than the TTL are treated as missing. When the stored
+    entries grow past the size cap the least recently read ones are deleted.
+    The cache is used from the reader's worker threads, so every access
+    holds a lock around the shared connection. Once closed, reads miss and
+    writes are dropped, so lookups still running at profile close finish.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "site TEXT NOT NULL, term TEXT NOT NULL, data TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (site, term))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.commit()
+        self._total_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, site, term, ttl_seconds):
+        """Return the cached entry dict, or None when it is missing or older than ttl_seconds."""
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                return None
+            row = self._db.execute(
+                "SELECT data, created FROM entries WHERE site = ? AND term = ?", (site, term)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            data, created = row
+            if now - created > ttl_seconds:
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE site = ? AND term = ?", (now, site, term))
+            self._db.commit()
+            self.stats["hits"] += 1
+        return json.loads(data)
+
+    def put(self, site, term, entry, max_bytes):
+        """Store an entry dict and evict the least recently read entries above max_bytes."""
+        data = json.dumps(entry, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                return
+            old = self._db.execute(
+                "SELECT size FROM entries WHERE site = ? AND term = ?", (site, term)).fetchone()
+            if old is not None:
+                self._total_size -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (site, term, data, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (site, term, data, size, now, now))
+            self._total_size += size
+            self.stats["writes"] += 1
+            self._evict(max_bytes)
+            self._db.commit()
+
+    def _evict(self, max_bytes):
+        while self._total_size > max_bytes:
+            rows = self._db.execute(
+                "SELECT site, term, size FROM entries ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                self._total_size = 0
+                return
+            for site, term, size in rows:
+                if self._total_size <= max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE site = ? AND term = ?", (site, term))
+                self._total_size -= size
+                self.stats["evictions"] += 1
+
+    def summary(self):
+        """Return (entry count, total bytes) of what is on disk."""
+        with self._lock:
+            if self._closed:
+                return 0, 0
+            count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return count, self._total_size
+
+    def clear(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self._total_size = 0
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def close(self):
+        # Waits for the statement a worker thread is running, if any
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._db.close()
+
+_lookup_cache = None
+
+def get_lookup_cache():
+    """Return the add-on wide LookupCache, opening user_files/lookup_cache.sqlite on first use."""
+    global _lookup_cache
+    if _lookup_cache is None:
+        _lookup_cache = LookupCache(os.path.join(config.get_user_files_dir(), "lookup_cache.sqlite"))
+    return _lookup_cache
+
+def close_lookup_cache():
+    global _lookup_cache
+    if _lookup_cache is not None:
+        _lookup_cache.close()
+        _lookup_cache = None
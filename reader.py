@@ -0,0 +1,200 @@
+import html
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from html.parser import HTMLParser
+
+FETCH_TIMEOUT_SECONDS = 10
+# Pages are cut off after this many bytes; dictionary entries come early in the page.
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+# Sites fetched at the same time for one reader lookup.
+READER_CONCURRENCY = 4
+# Items of each kind kept per site.
+MAX_ITEMS = 6
+
+# What the reader shows for one site: the tab title it stands for, the URL it
+# was fetched from and the extracted text (or the error that stopped it).
+ReaderEntry = namedtuple("ReaderEntry", ["title", "site", "url", "definitions", "ipa", "examples", "error"])
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+class ClassTextExtractor(HTMLParser):
+    """Collect the text of the elements matching a site's rules.
+
+    rules maps "definitions", "ipa" and "examples" to (tag, class) pairs; an
+    element matches when its tag is the given one (or tag is None) and its
+    class attribute contains the class. The page's og:description (or
+    description) meta tag is kept as a fallback definition.
+    """
+    def __init__(self, rules):
+        super().__init__(convert_charrefs=True)
+        self.rules = rules
+        self.results = {kind: [] for kind in ("definitions", "ipa", "examples")}
+        self.description = None
+        self._captures = []  # [kind, tag, depth, text parts] for each open matching element
+        self._skip_depth = 0
+
+    def _match(self, tag, attrs):
+        classes = set()
+        for name, value in attrs:
+            if name == "class" and value:
+                classes.update(value.split())
+        if not classes:
+            return None
+        for kind, selectors in self.rules.items():
+            for rule_tag, rule_class in selectors:
+                if (rule_tag is None or rule_tag == tag) and rule_class in classes:
+                    return kind
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "meta":
+            attrs_dict = dict(attrs)
+            key = attrs_dict.get("property") or attrs_dict.get("name")
+            if key in ("og:description", "description") and attrs_dict.get("content"):
+                if self.description is None or key == "og:description":
+                    self.description = attrs_dict["content"]
+            return
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                for capture in self._captures:
+                    capture[3].append(" ")
+            return
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+            return
+        for capture in self._captures:
+            if capture[1] == tag:
+                capture[2] += 1
+        kind = self._match(tag, attrs)
+        if kind is not None and len(self.results[kind]) < MAX_ITEMS:
+            self._captures.append([kind, tag, 1, []])
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        for capture in list(self._captures):
+            if capture[1] != tag:
+                continue
+            capture[2] -= 1
+            if capture[2] == 0:
+                self._captures.remove(capture)
+                text = " ".join("".join(capture[3]).split())
+                items = self.results[capture[0]]
+                if text and text not in items and len(items) < MAX_ITEMS:
+                    items.append(text)
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        for capture in self._captures:
+            capture[3].append(data)
+
+# site name -> rules for ClassTextExtractor
+EXTRACTORS = {}
+
+def register_extractor(site, definitions=(), ipa=(), examples=()):
+    """Register the (tag, class) selectors used to read a site's pages in reader mode."""
+    EXTRACTORS[site] = {"definitions": tuple(definitions), "ipa": tuple(ipa), "examples": tuple(examples)}
+
+register_extractor("Cambridge Dictionary",
+                   definitions=[("div", "ddef_d")], ipa=[("span", "ipa")], examples=[("span", "deg")])
+register_extractor("Cambridge Việt",
+                   definitions=[("span", "dtrans-se"), ("div", "ddef_d")], ipa=[("span", "ipa")],
+                   examples=[("span", "deg")])
+register_extractor("Oxford Dictionary",
+                   definitions=[("span", "def")], ipa=[("span", "phon")], examples=[("span", "x")])
+register_extractor("Merriam-Webster",
+                   definitions=[("span", "dtText")], ipa=[("span", "prs")], examples=[("span", "ex-sent")])
+register_extractor("Longman Dictionary",
+                   definitions=[("span", "DEF")], ipa=[("span", "PRON")], examples=[("span", "EXAMPLE")])
+register_extractor("Collins Dictionary",
+                   definitions=[("div", "def")], ipa=[("span", "pron")], examples=[("span", "quote")])
+register_extractor("Vocabulary.com",
+                   definitions=[("div", "definition")], examples=[("div", "example")])
+register_extractor("The Free Dictionary",
+                   definitions=[("div", "ds-list"), ("div", "ds-single")], ipa=[("span", "pron")],
+                   examples=[("span", "illustration")])
+
+def extract(site, page_html):
+    """Run the site's extractor over a page and return (definitions, ipa, examples) as lists of text."""
+    parser = ClassTextExtractor(EXTRACTORS.get(site, {}))
+    parser.feed(page_html)
+    parser.close()
+    results = parser.results
+    definitions = results["definitions"]
+    if not definitions and parser.description:
+        definitions = [" ".join(parser.description.split())]
+    return definitions, results["ipa"], results["examples"]
+
+def fetch_page(url):
+    """Download a page as text with the sidebar's user agent. Meant to run off the UI thread."""
+    from .config import MOBILE_USER_AGENT
+    request = urllib.request.Request(url, headers={"User-Agent": MOBILE_USER_AGENT})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT_SECONDS) as response:
+        charset = response.headers.get_content_charset() or "utf-8"
+        return response.read(MAX_PAGE_BYTES).decode(charset, errors="replace")
+
+def lookup_target(target, term=None, cache=None, ttl_seconds=0, max_bytes=0, before_fetch=None):
+    """Return the ReaderEntry of one SearchTarget.
+
+    With a LookupCache and the normalised term, an entry cached for the
+    site within ttl_seconds is used instead of fetching the page, and a
+    freshly extracted entry is stored in the cache. before_fetch(site) is
+    called right before going to the network, e.g. to rate limit.
+    """
+    use_cache = cache is not None and term
+    if use_cache:
+        try:
+            cached = cache.get(target.site, term, ttl_seconds)
+        except Exception as e:
+            # A locked or damaged cache is treated as a miss
+            print(f"Failed to read cached lookup: {e}")
+            cached = None
+        if cached is not None:
+            return ReaderEntry(target.title, target.site, target.url,
+                               cached["definitions"], cached["ipa"], cached["examples"], None)
+    try:
+        if before_fetch is not None:
+            before_fetch(target.site)
+        definitions, ipa, examples = extract(target.site, fetch_page(target.url))
+    except Exception as e:
+        return ReaderEntry(target.title, target.site, target.url, [], [], [], str(e))
+    if use_cache:
+        try:
+            cache.put(target.site, term, {"definitions": definitions, "ipa": ipa, "examples": examples}, max_bytes)
+        except Exception as e:
+            print(f"Failed to cache lookup: {e}")
+    return ReaderEntry(target.title, target.site, target.url, definitions, ipa, examples, None)
+
+def lookup(search_urls, term=None, cache=None, ttl_seconds=0, max_bytes=0):
+    """Look up every SearchTarget, a few at a time; returns ReaderEntries in search order."""
+    if not search_urls:
+        return []
+    fetch = partial(lookup_target, term=term, cache=cache, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+    with ThreadPoolExecutor(max_workers=min(READER_CONCURRENCY, len(search_urls))) as pool:
+        return list(pool.map(fetch, search_urls))
+
+def render_html(term, entries):
+    """Render the lookup results of all sites as one HTML document for the reader view.
+
+    Each site title links to "full:<index>", which opens that site's full tab.
+    """
+    parts = [f"<h3>{html.escape(term)}</h3>"] if term else []
+    for index, entry in enumerate(entries):
+        parts.append(f'<p><b><a href="full:{index}">{html.escape(entry.title)}</a></b>')
+        if entry.ipa:
+            parts.append(" &nbsp; " + html.escape(" · ".join(entry.ipa)))
+        parts.append("</p>")
+        if entry.error:
+            parts.append(f'<p style="color: gray;">Could not load: {html.escape(entry.error)}</p>')
+        elif not entry.definitions and not entry.examples:
+            parts.append('<p style="color: gray;">Nothing found in reader mode. Open the full page.</p>')
+        if entry.definitions:
+            parts.append("<ol>" + "".join(f"<li>{html.escape(d)}</li>" for d in entry.definitions) + "</ol>")
+        if entry.examples:
+            parts.append("<ul>" + "".join(f"<li><i>{html.escape(e)}</i></li>" for e in entry.examples) + "</ul>")
+    return "".join(parts)
@@ -0,0 +1,136 @@
+import json
+from urllib.parse import urlsplit
+from aqt.qt import QWebEngineScript
+from . import config
+
+SCRIPT_NAME_PREFIX = "better-web-browser-"
+
+# Ép thẻ meta viewport ngay khi <head> xuất hiện, trước lần layout đầu tiên,
+# và sửa lại mọi thẻ viewport của trang khi DOM đã parse xong.
+VIEWPORT_SCRIPT = """
+(function () {
+    var CONTENT = 'width=device-width, initial-scale=1.0';
+    var added = false;
+    function apply() {
+        if (!document.head) {
+            return;
+        }
+        if (!added && !document.querySelector('meta[name=viewport]')) {
+            var meta = document.createElement('meta');
+            meta.name = 'viewport';
+            document.head.appendChild(meta);
+        }
+        added = true;
+        document.querySelectorAll('meta[name=viewport]').forEach(function (meta) {
+            meta.setAttribute('content', CONTENT);
+        });
+    }
+    var observer = new MutationObserver(function () {
+        if (document.head && !added) {
+            apply();
+        }
+    });
+    observer.observe(document, {childList: true, subtree: true});
+    document.addEventListener('DOMContentLoaded', function () {
+        observer.disconnect();
+        apply();
+    });
+})();
+"""
+
+# Adds a <style> element as soon as the document element exists, before first paint.
+STYLE_SCRIPT = """
+(function () {
+    var css = %s;
+    function add() {
+        var root = document.head || document.documentElement;
+        if (!root) {
+            return false;
+        }
+        var style = document.createElement('style');
+        style.textContent = css;
+        root.appendChild(style);
+        return true;
+    }
+    if (!add()) {
+        new MutationObserver(function (mutations, observer) {
+            if (add()) {
+                observer.disconnect();
+            }
+        }).observe(document, {childList: true});
+    }
+})();
+"""
+
+# Hidden on every known site: consent banners and ad slots.
+COMMON_SITE_CSS = """
+#onetrust-consent-sdk, #onetrust-banner-sdk, .fc-consent-root, #qc-cmp2-container,
+#CybotCookiebotDialog, .cc-window, #didomi-host, #sp_message_container,
+.adsbygoogle, ins.adsbygoogle, [id^="google_ads_iframe"], [id^="div-gpt-ad"] {
+    display: none !important;
+}
+"""
+
+def site_match_patterns(url_template):
+    """Return the @match patterns covering a site's pages, from its URL template."""
+    host = urlsplit(url_template.replace("{}", "x")).hostname
+    if not host:
+        return []
+    return [f"*://{host}/*"]
+
+def make_script(name, source, match_patterns=(), injection_point=QWebEngineScript.InjectionPoint.DocumentCreation):
+    """Build a QWebEngineScript; match_patterns limit it to those pages (all pages when empty)."""
+    if match_patterns:
+        header = ["// ==UserScript=="]
+        header += [f"// @match {pattern}" for pattern in match_patterns]
+        header.append("// ==/UserScript==")
+        source = "\n".join(header) + "\n" + source
+    script = QWebEngineScript()
+    script.setName(SCRIPT_NAME_PREFIX + name)
+    script.setSourceCode(source)
+    script.setInjectionPoint(injection_point)
+    script.setWorldId(QWebEngineScript.ScriptWorldId.ApplicationWorld)
+    script.setRunsOnSubFrames(False)
+    return script
+
+def style_script(name, css, match_patterns=()):
+    return make_script(name, STYLE_SCRIPT % json.dumps(css), match_patterns)
+
+class UserScriptManager:
+    """Keep the add-on's user scripts registered on a profile.
+
+    Installs the viewport fix for every page, the common clutter-hiding CSS
+    for the registry's sites and each site's own CSS from site_css, all at
+    DocumentCreation so they apply before first paint. The scripts are
+    rebuilt when the configuration changes.
+    """
+    def __init__(self, profile):
+        self.profile = profile
+        self._scripts = []
+        config.add_config_listener(lambda cfg: self.install())
+
+    def build_scripts(self, cfg):
+        from .sites import get_site_registry
+        registry = get_site_registry()
+        scripts = [make_script("viewport", VIEWPORT_SCRIPT)]
+        for site_name, css in cfg.get("site_css", {}).items():
+            patterns = []
+            for entry in registry.find_by_name(site_name):
+                for pattern in site_match_patterns(entry.url):
+                    if pattern not in patterns:
+                        patterns.append(pattern)
+            if css.strip() and patterns:
+                scripts.append(style_script(f"css-{site_name}", css.strip(), patterns))
+        # Hosts come from the registry index, so no site pack is read here
+        common_patterns = [f"*://{host}/*" for host in registry.hosts()]
+        if common_patterns:
+            scripts.append(style_script("css-common", COMMON_SITE_CSS, common_patterns))
+        return scripts
+
+    def install(self):
+        collection = self.profile.scripts()
+        for script in self._scripts:
+            collection.remove(script)
+        self._scripts = self.build_scripts(config.get_config())
+        for script in self._scripts:
+            collection.insert(script)
@@ -1,14 +1,58 @@
+import copy
 from functools import partial
 from aqt.qt import (
     QDialog, QVBoxLayout, QHBoxLayout, 
     QLabel, QLineEdit, QPushButton, QComboBox, QCheckBox, 
-    QScrollArea, QGroupBox, QWidget, QListWidget, QListWidgetItem, Qt, QTreeWidget, QTreeWidgetItem,
-    QDialogButtonBox, QEvent, QKeySequence, QSplitter
+    QScrollArea, QGroupBox, QWidget, QListWidget, QListWidgetItem, Qt, QTreeView,
+    QStandardItemModel, QStandardItem, QSortFilterProxyModel,
+    QDialogButtonBox, QEvent, QKeySequence, QSplitter, QSpinBox, QDesktopServices, QUrl,
+    QInputDialog, QFileDialog
 )
 from aqt import mw
 from aqt.utils import showInfo
 from . import config
-from .config import PREDEFINED_SEARCH_SITES
+from .config import SITE_POLICY_KEYS
+from .sites import SitePackError, get_site_registry
+
+# Sites tree columns: the site (checked when enabled), its resource policy and its URL template.
+SITES_HEADERS = ["Site", "Images", "JavaScript", "Fonts", "Media", "URL Template"]
+POLICY_COLUMNS = {1: "images", 2: "javascript", 3: "fonts", 4: "media"}
+URL_COLUMN = 5
+
+# Category rows are filled with their sites the first time they are needed. Until then they
+# hold one placeholder row (so they can be expanded) and the field's enabled site ids in the category.
+LOADED_ROLE = Qt.ItemDataRole.UserRole + 1
+SAVED_SITES_ROLE = Qt.ItemDataRole.UserRole + 2
+# Registry id of the site a row shows, on the row's name item.
+SITE_ID_ROLE = Qt.ItemDataRole.UserRole + 3
+
+def _site_depth(item):
+    """Return 0 for field rows, 1 for category rows and 2 for site rows of the sites model."""
+    depth = 0
+    while item.parent() is not None:
+        item = item.parent()
+        depth += 1
+    return depth
+
+class SiteFilterProxyModel(QSortFilterProxyModel):
+    """Filter the sites tree by site name; fields and categories stay while any of their sites shows."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRecursiveFilteringEnabled(True)
+        self._text = ""
+
+    def set_filter_text(self, text):
+        self._text = text.lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._text:
+            return True
+        if not source_parent.isValid() or not source_parent.parent().isValid():
+            # Field and category rows are kept by recursive filtering when a site below them matches
+            return False
+        name = self.sourceModel().index(source_row, 0, source_parent).data()
+        return name is not None and self._text in name.lower()
 
 class ShortcutEdit(QLineEdit):
     def __init__(self, parent=None):
@@ -59,11 +103,11 @@ class SettingsDialog(QDialog):
         # Nút này sẽ nằm bên cạnh nút Thu nhỏ và nút Đóng (X).
         self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowMaximizeButtonHint)
 
-        self.field_site_checkboxes = {}  # [note_type][field_name][category_name][site_name] -> QCheckBox
-        self.configurable_field_details = {} # [field_name] -> { "group_box": QGroupBox, "content_widget": QWidget, "toggle_button": QPushButton, "categories": {}}
-        
         self.current_note_type_name = None # To track current note type easily
-        self.current_main_field_name = None # To track current main field easily
+        # Main field of every note type, edited here for whichever type is selected
+        self._main_fields = dict(config.get_config().get("main_fields", {}))
+        # Fields and sites edited for note types other than the selected one, kept until OK
+        self._note_type_edits = {}  # note type -> (configurable fields, {field: [site id]})
 
         self.setup_ui()
         self.load_config()
@@ -90,6 +134,8 @@ class SettingsDialog(QDialog):
         main_field_group = QGroupBox("Main Field")
         main_field_layout = QVBoxLayout()
         self.main_field_combo = QComboBox()
+        self.main_field_combo.setToolTip("Field searched for notes of this note type, in the editor and the Browser")
+        self.main_field_combo.activated.connect(self._on_main_field_chosen)
         main_field_layout.addWidget(self.main_field_combo)
         main_field_group.setLayout(main_field_layout)
         left_column.addWidget(main_field_group)
@@ -112,6 +158,89 @@ class SettingsDialog(QDialog):
         shortcut_group.setLayout(shortcut_layout)
         left_column.addWidget(shortcut_group)
         
+        # Tab Loading
+        tab_loading_group = QGroupBox("Tab Loading")
+        tab_loading_layout = QVBoxLayout()
+        self.lazy_tabs_check = QCheckBox("Load background tabs only when opened")
+        self.lazy_tabs_check.toggled.connect(lambda checked: self.eager_tabs_spin.setEnabled(checked))
+        tab_loading_layout.addWidget(self.lazy_tabs_check)
+        self.reader_mode_check = QCheckBox("Reader mode: show extracted text, open full pages on demand")
+        self.reader_mode_check.setToolTip(
+            "Fetch each site's page in the background and show the definitions, IPA and examples "
+            "of all sites together. Click a site's title to open its full page.")
+        tab_loading_layout.addWidget(self.reader_mode_check)
+        self.history_check = QCheckBox("Keep a searchable history of lookups")
+        tab_loading_layout.addWidget(self.history_check)
+        eager_tabs_layout = QHBoxLayout()
+        eager_tabs_layout.addWidget(QLabel("Preload next tabs:"))
+        self.eager_tabs_spin = QSpinBox()
+        self.eager_tabs_spin.setRange(0, 20)
+        self.eager_tabs_spin.setToolTip("Number of tabs after the active one that load in the background")
+        eager_tabs_layout.addWidget(self.eager_tabs_spin)
+        tab_loading_layout.addLayout(eager_tabs_layout)
+        debounce_layout = QHBoxLayout()
+        debounce_layout.addWidget(QLabel("Browser search delay (ms):"))
+        self.debounce_spin = QSpinBox()
+        self.debounce_spin.setRange(0, 2000)
+        self.debounce_spin.setSingleStep(50)
+        self.debounce_spin.setToolTip("Wait this long after the selection in the Browser stops changing before searching")
+        debounce_layout.addWidget(self.debounce_spin)
+        tab_loading_layout.addLayout(debounce_layout)
+        tab_cache_layout = QHBoxLayout()
+        tab_cache_layout.addWidget(QLabel("Recent tabs memory (MB):"))
+        self.tab_cache_spin = QSpinBox()
+        self.tab_cache_spin.setRange(0, 4000)
+        self.tab_cache_spin.setSingleStep(50)
+        self.tab_cache_spin.setToolTip("Keep tabs of recently searched notes in memory so going back to them is instant (0 disables)")
+        tab_cache_layout.addWidget(self.tab_cache_spin)
+        tab_loading_layout.addLayout(tab_cache_layout)
+        prefetch_layout = QHBoxLayout()
+        prefetch_layout.addWidget(QLabel("Prefetch Browser rows:"))
+        self.prefetch_rows_spin = QSpinBox()
+        self.prefetch_rows_spin.setRange(0, 10)
+        self.prefetch_rows_spin.setToolTip("Look up this many rows after the selected note in the background (needs recent tabs memory)")
+        prefetch_layout.addWidget(self.prefetch_rows_spin)
+        self.prefetch_previous_check = QCheckBox("Also previous rows")
+        prefetch_layout.addWidget(self.prefetch_previous_check)
+        tab_loading_layout.addLayout(prefetch_layout)
+        tab_loading_group.setLayout(tab_loading_layout)
+        left_column.addWidget(tab_loading_group)
+        
+        # Memory
+        memory_group = QGroupBox("Memory")
+        memory_layout = QVBoxLayout()
+        self.lifecycle_check = QCheckBox("Freeze and discard background tabs")
+        self.lifecycle_check.toggled.connect(self._update_memory_controls)
+        memory_layout.addWidget(self.lifecycle_check)
+        self.freeze_after_spin = self._add_spin_row(memory_layout, "Freeze after (seconds):", 10, 3600, 30,
+            "Stop running scripts in tabs that have not been looked at for this long")
+        self.discard_after_spin = self._add_spin_row(memory_layout, "Discard after (seconds):", 30, 86400, 60,
+            "Release the memory of tabs that have not been looked at for this long; they reload when selected")
+        self.memory_budget_spin = self._add_spin_row(memory_layout, "Memory budget (MB):", 100, 16000, 100,
+            "Discard the least recently used tabs when the sidebar's tabs would use more than this")
+        self.lookup_cache_ttl_spin = self._add_spin_row(memory_layout, "Lookup cache (days):", 0, 3650, 7,
+            "Keep reader mode lookups on disk for this many days; 0 turns the lookup cache off")
+        self.lookup_cache_size_spin = self._add_spin_row(memory_layout, "Lookup cache size (MB):", 1, 10000, 10,
+            "Drop the least recently used cached lookups when the cache grows past this")
+        self.bulk_concurrency_spin = self._add_spin_row(memory_layout, "Cache warming threads:", 1, 32, 1,
+            "Lookups run at the same time by Notes > Warm Lookup Cache in the Browser")
+        self.bulk_rate_spin = self._add_spin_row(memory_layout, "Requests per site per minute:", 1, 600, 10,
+            "Limit how often cache warming requests pages from any one site")
+        memory_group.setLayout(memory_layout)
+        left_column.addWidget(memory_group)
+        
+        # Blocking
+        blocking_group = QGroupBox("Blocking")
+        blocking_layout = QHBoxLayout()
+        self.blocklist_check = QCheckBox("Block ads and trackers")
+        self.blocklist_check.setToolTip("Block requests to the hosts listed in the blocklist, and their subdomains")
+        blocking_layout.addWidget(self.blocklist_check)
+        edit_blocklist_button = QPushButton("Edit Blocklist...")
+        edit_blocklist_button.clicked.connect(self._edit_blocklist)
+        blocking_layout.addWidget(edit_blocklist_button)
+        blocking_group.setLayout(blocking_layout)
+        left_column.addWidget(blocking_group)
+        
         # Right Column - Search Sites
         sites_group = QGroupBox("Search Sites")
         sites_layout = QVBoxLayout()
@@ -126,10 +255,41 @@ class SettingsDialog(QDialog):
         search_layout.addWidget(self.search_edit)
         sites_layout.addLayout(search_layout)
         
-        # Create single column for sites
-        self.sites_tree = QTreeWidget()
-        self.sites_tree.setHeaderLabels(["Site", "Enabled", "URL Template"])
+        # Sites of every configurable field: field > category > site rows
+        self.sites_model = QStandardItemModel(0, len(SITES_HEADERS), self)
+        self.sites_model.setHorizontalHeaderLabels(SITES_HEADERS)
+        for column, tip in ((1, "Load images on this site's pages"), (2, "Run this site's scripts"),
+                            (3, "Download web fonts on this site's pages"),
+                            (4, "Load audio and video on this site's pages")):
+            self.sites_model.horizontalHeaderItem(column).setToolTip(tip)
+        self.sites_model.itemChanged.connect(self._on_site_item_changed)
+        self.sites_proxy = SiteFilterProxyModel(self)
+        self.sites_proxy.setSourceModel(self.sites_model)
+        self.sites_tree = QTreeView()
+        self.sites_tree.setModel(self.sites_proxy)
+        self.sites_tree.setUniformRowHeights(True)
+        self.sites_tree.doubleClicked.connect(self._edit_site_css)
+        self.sites_tree.expanded.connect(self._on_tree_expanded)
+        # Set while one check change is copied to other items, so those copies are not handled again
+        self._syncing = False
+        # Enabled site ids of the current note type's fields, including fields unticked in this dialog
+        self._enabled_sites = {}
+        # Resource policies and CSS are per site, shared by every field that searches the site
+        self._site_policies = copy.deepcopy(config.get_config().get("site_policies", {}))
+        self._site_css = dict(config.get_config().get("site_css", {}))
         sites_layout.addWidget(self.sites_tree)
+        sites_layout.addWidget(QLabel("Tick a site to search it for the field. Double-click a site to edit "
+                                      "the CSS added to its pages before they are shown."))
+        packs_layout = QHBoxLayout()
+        import_pack_button = QPushButton("Import Site Pack...")
+        import_pack_button.setToolTip("Add the sites of a site pack (JSON) to the list; a pack with the same id is replaced")
+        import_pack_button.clicked.connect(self._import_site_pack)
+        packs_layout.addWidget(import_pack_button)
+        export_pack_button = QPushButton("Export Site Pack...")
+        export_pack_button.clicked.connect(self._export_site_pack)
+        packs_layout.addWidget(export_pack_button)
+        packs_layout.addStretch()
+        sites_layout.addLayout(packs_layout)
         
         sites_group.setLayout(sites_layout)
         right_column.addWidget(sites_group)
@@ -152,6 +312,26 @@ class SettingsDialog(QDialog):
         self.setMinimumWidth(800)
         self.setMinimumHeight(600)
 
+    def _add_spin_row(self, layout, label, minimum, maximum, step, tooltip):
+        row_layout = QHBoxLayout()
+        row_layout.addWidget(QLabel(label))
+        spin = QSpinBox()
+        spin.setRange(minimum, maximum)
+        spin.setSingleStep(step)
+        spin.setToolTip(tooltip)
+        row_layout.addWidget(spin)
+        layout.addLayout(row_layout)
+        return spin
+
+    def _edit_blocklist(self):
+        from .blocklist import ensure_blocklist_file
+        QDesktopServices.openUrl(QUrl.fromLocalFile(ensure_blocklist_file()))
+
+    def _update_memory_controls(self, enabled):
+        self.freeze_after_spin.setEnabled(enabled)
+        self.discard_after_spin.setEnabled(enabled)
+        self.memory_budget_spin.setEnabled(enabled)
+
     def load_config(self):
         cfg = config.get_config()
         
@@ -169,14 +349,33 @@ class SettingsDialog(QDialog):
                 
         # Load main field
         self.update_main_field_combo()
-        if cfg.get("main_field"):
-            index = self.main_field_combo.findText(cfg["main_field"])
-            if index >= 0:
-                self.main_field_combo.setCurrentIndex(index)
                 
         # Load refresh shortcut
         self.shortcut_edit.setText(cfg.get("refresh_shortcut", "Ctrl+R"))
         
+        # Load tab loading options
+        self.lazy_tabs_check.setChecked(cfg.get("lazy_tabs", True))
+        self.eager_tabs_spin.setValue(cfg.get("eager_tab_count", 0))
+        self.eager_tabs_spin.setEnabled(self.lazy_tabs_check.isChecked())
+        self.reader_mode_check.setChecked(cfg.get("reader_mode", False))
+        self.history_check.setChecked(cfg.get("history_enabled", True))
+        self.debounce_spin.setValue(cfg.get("selection_debounce_ms", 150))
+        self.tab_cache_spin.setValue(cfg.get("tab_cache_budget_mb", 300))
+        self.prefetch_rows_spin.setValue(cfg.get("prefetch_rows", 0))
+        self.prefetch_previous_check.setChecked(cfg.get("prefetch_previous", False))
+        
+        # Load memory options
+        self.lifecycle_check.setChecked(cfg.get("lifecycle_enabled", True))
+        self.freeze_after_spin.setValue(cfg.get("freeze_after_seconds", 120))
+        self.discard_after_spin.setValue(cfg.get("discard_after_seconds", 600))
+        self.memory_budget_spin.setValue(cfg.get("memory_budget_mb", 800))
+        self._update_memory_controls(self.lifecycle_check.isChecked())
+        self.lookup_cache_ttl_spin.setValue(cfg.get("lookup_cache_ttl_days", 30))
+        self.blocklist_check.setChecked(cfg.get("blocklist_enabled", True))
+        self.lookup_cache_size_spin.setValue(cfg.get("lookup_cache_size_mb", 50))
+        self.bulk_concurrency_spin.setValue(cfg.get("bulk_lookup_concurrency", 4))
+        self.bulk_rate_spin.setValue(cfg.get("bulk_lookup_site_rate_per_minute", 60))
+        
         # Load configurable fields
         self.update_fields_list()
         
@@ -189,8 +388,16 @@ class SettingsDialog(QDialog):
         if note_type:
             model = mw.col.models.by_name(note_type)
             if model:
+                self.main_field_combo.addItem("(don't search this note type)", "")
                 for field in model['flds']:
-                    self.main_field_combo.addItem(field['name'])
+                    self.main_field_combo.addItem(field['name'], field['name'])
+                index = self.main_field_combo.findData(self._main_fields.get(note_type, ""))
+                self.main_field_combo.setCurrentIndex(max(0, index))
+
+    def _on_main_field_chosen(self, index):
+        note_type = self.note_type_combo.currentText()
+        if note_type:
+            self._main_fields[note_type] = self.main_field_combo.currentData()
                     
     def update_fields_list(self):
         self.fields_list.clear()
@@ -198,8 +405,11 @@ class SettingsDialog(QDialog):
         if note_type:
             model = mw.col.models.by_name(note_type)
             if model:
-                cfg = config.get_config()
-                configurable_fields = cfg.get("configurable_fields", {}).get(note_type, [])
+                if note_type in self._note_type_edits:
+                    configurable_fields = self._note_type_edits[note_type][0]
+                else:
+                    cfg = config.get_config()
+                    configurable_fields = cfg.get("configurable_fields", {}).get(note_type, [])
                 
                 for field in model['flds']:
                     item = QListWidgetItem(field['name'])
@@ -210,164 +420,350 @@ class SettingsDialog(QDialog):
                     )
                     self.fields_list.addItem(item)
                     
-    def update_sites_tree(self):
-        """Update the sites tree based on selected fields."""
-        self.sites_tree.clear()
+    def update_sites_tree(self, enabled_sites=None):
+        """Rebuild the sites tree for the selected note type and its ticked fields.
+
+        The saved configuration is shown unless enabled_sites gives {field: [site id]} to show.
+        """
+        self.sites_model.removeRows(0, self.sites_model.rowCount())
         note_type = self.note_type_combo.currentText()
+        self._enabled_sites = {}
         if not note_type:
             return
 
-        # Get selected fields
-        selected_fields = []
+        if enabled_sites is None:
+            # Load saved configurations
+            cfg = config.get_config()
+            enabled_sites = copy.deepcopy(cfg.get("enabled_sites", {}).get(note_type, {}))
+        self._enabled_sites = enabled_sites
+        
+        for field_name in self._checked_fields():
+            self._add_field_rows(field_name, self.sites_model.rowCount())
+        
+        # Resize columns
+        for column in range(len(SITES_HEADERS)):
+            self.sites_tree.resizeColumnToContents(column)
+
+    def _checked_fields(self):
+        fields = []
         for i in range(self.fields_list.count()):
             item = self.fields_list.item(i)
             if item.checkState() == Qt.CheckState.Checked:
-                selected_fields.append(item.text())
+                fields.append(item.text())
+        return fields
 
-        if not selected_fields:
-            return
+    def _field_row(self, field_name):
+        for row in range(self.sites_model.rowCount()):
+            if self.sites_model.item(row).text() == field_name:
+                return row
+        return None
 
-        # Load saved configurations
-        cfg = config.get_config()
-        field_configs = cfg.get("field_search_configs", {}).get(note_type, {})
+    def _add_field_rows(self, field_name, position):
+        """Build a field's category and site rows and insert them into the model as one row."""
+        registry = get_site_registry()
+        # Ids of sites a pack has overridden since they were enabled tick the overriding row
+        enabled = {registry.current_id(site_id) for site_id in self._enabled_sites.get(field_name, ())}
+        field_item = QStandardItem(field_name)
+        field_item.setEditable(False)
         
-        # Add all fields to single tree
-        for field_name in selected_fields:
-            self._add_field_to_tree(self.sites_tree, field_name, field_configs.get(field_name, {}))
+        # Every category of the registry; sites are added when a category is first needed
+        for category in registry.categories():
+            cat_item = QStandardItem(category)
+            cat_item.setEditable(False)
+            cat_item.setCheckable(True)
+            cat_item.setToolTip("Tick to search every site of this category")
+            cat_item.setData(False, LOADED_ROLE)
+            cat_item.setData([site_id for site_id in registry.site_ids(category).values() if site_id in enabled],
+                             SAVED_SITES_ROLE)
+            placeholder = QStandardItem()
+            placeholder.setFlags(Qt.ItemFlag.NoItemFlags)
+            cat_item.appendRow(placeholder)
+            cat_item.setCheckState(self._category_state(cat_item))
+            field_item.appendRow(cat_item)
         
-        # Resize columns
-        self.sites_tree.resizeColumnToContents(0)
-        self.sites_tree.resizeColumnToContents(1)
-        self.sites_tree.resizeColumnToContents(2)
-
-    def _add_field_to_tree(self, tree, field_name, field_config):
-        """Add a field and its sites to a tree widget."""
-        field_item = QTreeWidgetItem([field_name, "", ""])
-        tree.addTopLevelItem(field_item)
-        
-        # Add all predefined categories and sites
-        for category, sites in PREDEFINED_SEARCH_SITES.items():
-            cat_item = QTreeWidgetItem([category, "", ""])
-            field_item.addChild(cat_item)
-            
-            # Create toggle button for category
-            toggle_btn = QPushButton("Select All")
-            toggle_btn.setCheckable(True)
-            toggle_btn.clicked.connect(lambda checked, cat=cat_item, btn=toggle_btn: self._toggle_category_sites(cat, checked, btn))
-            tree.setItemWidget(cat_item, 1, toggle_btn)
-            
-            # Get saved site states for this category
-            saved_sites = field_config.get(category, {})
-            
-            # Check if all sites are enabled
-            all_enabled = all(saved_sites.get(site_name, False) for site_name in sites)
-            toggle_btn.setChecked(all_enabled)
-            
-            for site_name, url_template in sites.items():
-                # Check if site was previously enabled
-                is_enabled = saved_sites.get(site_name, False)
-                
-                site_item = QTreeWidgetItem([site_name, "", url_template])
-                site_item.setCheckState(1, Qt.CheckState.Checked if is_enabled else Qt.CheckState.Unchecked)
-                cat_item.addChild(site_item)
-        
-        # Expand the field item by default
-        field_item.setExpanded(True)
+        # The subtree is complete before it joins the model, so the view updates once
+        self.sites_model.insertRow(position, field_item)
+        self.sites_tree.expand(self.sites_proxy.mapFromSource(field_item.index()))
 
-    def _toggle_category_sites(self, category_item, checked, button):
-        """Toggle all sites in a category."""
-        for i in range(category_item.childCount()):
-            site_item = category_item.child(i)
-            site_item.setCheckState(1, Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked)
-        
-        # Update button text
-        button.setText("Deselect All" if checked else "Select All")
+    def _make_site_row(self, site_id, site_name, url_template, is_enabled):
+        name_item = QStandardItem(site_name)
+        name_item.setData(site_id, SITE_ID_ROLE)
+        name_item.setEditable(False)
+        name_item.setCheckable(True)
+        name_item.setCheckState(Qt.CheckState.Checked if is_enabled else Qt.CheckState.Unchecked)
+        self._update_css_tooltip(name_item)
+        row = [name_item]
+        policy = self._site_policies.get(site_name, {})
+        for column, key in POLICY_COLUMNS.items():
+            policy_item = QStandardItem()
+            policy_item.setEditable(False)
+            policy_item.setCheckable(True)
+            policy_item.setCheckState(Qt.CheckState.Checked if policy.get(key, True) else Qt.CheckState.Unchecked)
+            row.append(policy_item)
+        url_item = QStandardItem(url_template)
+        url_item.setEditable(False)
+        row.append(url_item)
+        return row
+
+    def _populate_category(self, cat_item):
+        """Replace a category's placeholder row with its site rows, reading its site packs if needed."""
+        if cat_item.data(LOADED_ROLE) is not False:
+            return
+        saved_sites = set(cat_item.data(SAVED_SITES_ROLE) or ())
+        rows = [self._make_site_row(entry.id, site_name, entry.url, entry.id in saved_sites)
+                for site_name, entry in get_site_registry().sites(cat_item.text()).items()]
+        syncing, self._syncing = self._syncing, True
+        try:
+            cat_item.setData(True, LOADED_ROLE)
+            cat_item.removeRows(0, cat_item.rowCount())
+            for row in rows:
+                cat_item.appendRow(row)
+        finally:
+            self._syncing = syncing
+
+    @staticmethod
+    def _category_state(cat_item):
+        if cat_item.data(LOADED_ROLE) is False:
+            checked = len(cat_item.data(SAVED_SITES_ROLE) or ())
+            total = len(get_site_registry().site_names(cat_item.text()))
+        else:
+            checked = sum(1 for row in range(cat_item.rowCount())
+                          if cat_item.child(row, 0).checkState() == Qt.CheckState.Checked)
+            total = cat_item.rowCount()
+        if checked == 0:
+            return Qt.CheckState.Unchecked
+        if checked == total:
+            return Qt.CheckState.Checked
+        return Qt.CheckState.PartiallyChecked
+
+    def _enabled_sites_from_model(self, field_item):
+        """Return the ids of the sites ticked under a field row, in the order they are shown.
+
+        Enabled sites of packs the registry does not know (e.g. a pack that failed to load) are kept.
+        """
+        site_ids = []
+        for i in range(field_item.rowCount()):
+            cat_item = field_item.child(i, 0)
+            if cat_item.data(LOADED_ROLE) is False:
+                # Never shown, so still as saved
+                site_ids.extend(cat_item.data(SAVED_SITES_ROLE) or ())
+                continue
+            for j in range(cat_item.rowCount()):
+                name_item = cat_item.child(j, 0)
+                if name_item.checkState() == Qt.CheckState.Checked:
+                    site_ids.append(name_item.data(SITE_ID_ROLE))
+        registry = get_site_registry()
+        site_ids += [site_id for site_id in self._enabled_sites.get(field_item.text(), ())
+                     if not registry.has_site(site_id) and site_id not in site_ids]
+        return site_ids
+
+    def _site_items(self, site_name):
+        """Return the name items of every row for a site, under every field."""
+        items = self.sites_model.findItems(site_name, Qt.MatchFlag.MatchExactly | Qt.MatchFlag.MatchRecursive, 0)
+        return [item for item in items if _site_depth(item) == 2]
+
+    def _on_site_item_changed(self, item):
+        """Keep category ticks, site ticks and per-site policies consistent after one check changes."""
+        if self._syncing or item.parent() is None:
+            return
+        self._syncing = True
+        try:
+            parent = item.parent()
+            if parent.parent() is None:
+                # A category was ticked or unticked: apply it to all of its sites
+                state = item.checkState()
+                if state != Qt.CheckState.PartiallyChecked:
+                    self._populate_category(item)
+                    for row in range(item.rowCount()):
+                        item.child(row, 0).setCheckState(state)
+            elif item.column() == 0:
+                parent.setCheckState(self._category_state(parent))
+            elif item.column() in POLICY_COLUMNS:
+                column = item.column()
+                state = item.checkState()
+                site_name = parent.child(item.row(), 0).text()
+                self._site_policies.setdefault(site_name, {})[POLICY_COLUMNS[column]] = state == Qt.CheckState.Checked
+                for name_item in self._site_items(site_name):
+                    name_item.parent().child(name_item.row(), column).setCheckState(state)
+        finally:
+            self._syncing = False
+
+    def _update_css_tooltip(self, name_item):
+        css = self._site_css.get(name_item.text(), "").strip()
+        name_item.setToolTip(f"Custom CSS:\n{css}" if css else "Double-click to add custom CSS")
+
+    def _edit_site_css(self, index):
+        """Edit the CSS injected into a site's pages, e.g. to hide its header."""
+        item = self.sites_model.itemFromIndex(self.sites_proxy.mapToSource(index))
+        if item is None or index.column() not in (0, URL_COLUMN) or _site_depth(item) != 2:
+            return
+        site_name = item.parent().child(item.row(), 0).text()
+        css, ok = QInputDialog.getMultiLineText(
+            self, "Site CSS", f"CSS added to {site_name} pages (e.g. header, .ad {{ display: none !important; }}):",
+            self._site_css.get(site_name, ""))
+        if not ok:
+            return
+        if css.strip():
+            self._site_css[site_name] = css
+        else:
+            self._site_css.pop(site_name, None)
+        for name_item in self._site_items(site_name):
+            self._update_css_tooltip(name_item)
+
+    def _on_tree_expanded(self, index):
+        item = self.sites_model.itemFromIndex(self.sites_proxy.mapToSource(index))
+        if item is not None and _site_depth(item) == 1:
+            self._populate_category(item)
 
     def filter_sites(self, text):
         """Filter sites based on search text."""
-        for i in range(self.sites_tree.topLevelItemCount()):
-            field_item = self.sites_tree.topLevelItem(i)
-            field_visible = False
-            
-            for j in range(field_item.childCount()):
-                cat_item = field_item.child(j)
-                cat_visible = False
-                
-                for k in range(cat_item.childCount()):
-                    site_item = cat_item.child(k)
-                    site_name = site_item.text(0).lower()
-                    site_visible = text.lower() in site_name
-                    site_item.setHidden(not site_visible)
-                    cat_visible = cat_visible or site_visible
-                
-                cat_item.setHidden(not cat_visible)
-                field_visible = field_visible or cat_visible
-            
-            field_item.setHidden(not field_visible)
+        if text:
+            # Only categories with a matching site name need their rows
+            needle = text.lower()
+            registry = get_site_registry()
+            matching = {category for category in registry.categories()
+                        if any(needle in site_name.lower() for site_name in registry.site_names(category))}
+            for row in range(self.sites_model.rowCount()):
+                field_item = self.sites_model.item(row)
+                for i in range(field_item.rowCount()):
+                    cat_item = field_item.child(i, 0)
+                    if cat_item.text() in matching:
+                        self._populate_category(cat_item)
+        self.sites_proxy.set_filter_text(text)
+        if text:
+            self.sites_tree.expandAll()
+
+    def _import_site_pack(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Site Pack", "", "Site packs (*.json)")
+        if not path:
+            return
+        try:
+            pack_id, count = get_site_registry().import_pack(path)
+        except (SitePackError, OSError) as e:
+            showInfo(f"Could not import the site pack:\n{e}", parent=self)
+            return
+        # Show the new sites without losing the toggles made in this dialog
+        enabled_sites = self._enabled_sites
+        for row in range(self.sites_model.rowCount()):
+            field_item = self.sites_model.item(row)
+            enabled_sites[field_item.text()] = self._enabled_sites_from_model(field_item)
+        self.update_sites_tree(enabled_sites)
+        self.filter_sites(self.search_edit.text())
+        showInfo(f"Imported {count} sites from pack {pack_id}.", parent=self)
+
+    def _export_site_pack(self):
+        registry = get_site_registry()
+        packs = registry.packs()
+        labels = [f"{name} ({pack_id}, {count} sites)" for pack_id, name, count in packs]
+        label, ok = QInputDialog.getItem(self, "Export Site Pack", "Pack:", labels, 0, False)
+        if not ok:
+            return
+        pack_id = packs[labels.index(label)][0]
+        path, _ = QFileDialog.getSaveFileName(self, "Export Site Pack", f"{pack_id}.json", "Site packs (*.json)")
+        if not path:
+            return
+        try:
+            count = registry.export_pack(pack_id, path)
+        except (SitePackError, OSError) as e:
+            showInfo(f"Could not export the site pack:\n{e}", parent=self)
+            return
+        showInfo(f"Exported {count} sites to {path}.", parent=self)
+
+    def _note_type_state(self):
+        """Return (configurable fields, {field: [site id]}) as edited for the selected note type."""
+        enabled_sites = {field_name: site_ids for field_name, site_ids in self._enabled_sites.items() if site_ids}
+        for row in range(self.sites_model.rowCount()):
+            field_item = self.sites_model.item(row)
+            site_ids = self._enabled_sites_from_model(field_item)
+            if site_ids:
+                enabled_sites[field_item.text()] = site_ids
+            else:
+                enabled_sites.pop(field_item.text(), None)
+        return self._checked_fields(), enabled_sites
 
     def on_note_type_changed(self, note_type):
+        # Keep the edits of the note type being left, so several types can be set up before OK
+        if self.current_note_type_name:
+            self._note_type_edits[self.current_note_type_name] = self._note_type_state()
+        self.current_note_type_name = note_type
         self.update_main_field_combo()
         self.update_fields_list()
-        self.update_sites_tree()
+        edits = self._note_type_edits.get(note_type)
+        self.update_sites_tree(copy.deepcopy(edits[1]) if edits else None)
         
     def on_field_selection_changed(self, item):
-        """Handle field selection change in the fields list."""
-        self.update_sites_tree()
+        """Add or remove only the sites subtree of the field that was ticked or unticked."""
+        field_name = item.text()
+        row = self._field_row(field_name)
+        if item.checkState() == Qt.CheckState.Checked:
+            if row is None:
+                # Keep the fields in the order of the fields list
+                checked_before = self._checked_fields()
+                checked_before = checked_before[:checked_before.index(field_name)]
+                position = sum(1 for name in checked_before if self._field_row(name) is not None)
+                self._add_field_rows(field_name, position)
+        elif row is not None:
+            # Remember the field's toggles in case it is ticked again
+            self._enabled_sites[field_name] = self._enabled_sites_from_model(self.sites_model.item(row))
+            self.sites_model.removeRow(row)
 
     def accept(self):
-        cfg = config.get_config()
+        # get_config() returns the shared cached dict; edit a copy of it
+        cfg = copy.deepcopy(config.get_config())
         
         # Save note type
         cfg["note_type"] = self.note_type_combo.currentText()
         
-        # Save main field
-        cfg["main_field"] = self.main_field_combo.currentText()
+        # Save main fields; note types without one are not searched
+        cfg["main_fields"] = {note_type: field for note_type, field in self._main_fields.items() if field}
         
         # Save refresh shortcut
         cfg["refresh_shortcut"] = self.shortcut_edit.text()
         
-        # Save configurable fields
+        # Save tab loading options
+        cfg["lazy_tabs"] = self.lazy_tabs_check.isChecked()
+        cfg["eager_tab_count"] = self.eager_tabs_spin.value()
+        cfg["reader_mode"] = self.reader_mode_check.isChecked()
+        cfg["history_enabled"] = self.history_check.isChecked()
+        cfg["selection_debounce_ms"] = self.debounce_spin.value()
+        cfg["tab_cache_budget_mb"] = self.tab_cache_spin.value()
+        cfg["prefetch_rows"] = self.prefetch_rows_spin.value()
+        cfg["prefetch_previous"] = self.prefetch_previous_check.isChecked()
+        
+        # Save memory options
+        cfg["lifecycle_enabled"] = self.lifecycle_check.isChecked()
+        cfg["freeze_after_seconds"] = self.freeze_after_spin.value()
+        cfg["discard_after_seconds"] = self.discard_after_spin.value()
+        cfg["memory_budget_mb"] = self.memory_budget_spin.value()
+        cfg["lookup_cache_ttl_days"] = self.lookup_cache_ttl_spin.value()
+        cfg["blocklist_enabled"] = self.blocklist_check.isChecked()
+        cfg["lookup_cache_size_mb"] = self.lookup_cache_size_spin.value()
+        cfg["bulk_lookup_concurrency"] = self.bulk_concurrency_spin.value()
+        cfg["bulk_lookup_site_rate_per_minute"] = self.bulk_rate_spin.value()
+        
+        # Save configurable fields and search sites of every note type edited; only enabled sites are stored
         note_type = self.note_type_combo.currentText()
         if note_type:
-            configurable_fields = []
-            for i in range(self.fields_list.count()):
-                item = self.fields_list.item(i)
-                if item.checkState() == Qt.CheckState.Checked:
-                    configurable_fields.append(item.text())
-                    
+            self._note_type_edits[note_type] = self._note_type_state()
+        for edited_type, (configurable_fields, enabled_sites) in self._note_type_edits.items():
             if "configurable_fields" not in cfg:
                 cfg["configurable_fields"] = {}
-            cfg["configurable_fields"][note_type] = configurable_fields
+            cfg["configurable_fields"][edited_type] = configurable_fields
+            if "enabled_sites" not in cfg:
+                cfg["enabled_sites"] = {}
+            cfg["enabled_sites"][edited_type] = enabled_sites
             
-        # Save search sites configuration
-        if note_type:
-            field_configs = {}
-            for i in range(self.sites_tree.topLevelItemCount()):
-                field_item = self.sites_tree.topLevelItem(i)
-                field_name = field_item.text(0)
-                field_config = {}
-                
-                for j in range(field_item.childCount()):
-                    cat_item = field_item.child(j)
-                    category = cat_item.text(0)
-                    sites = {}
-                    
-                    for k in range(cat_item.childCount()):
-                        site_item = cat_item.child(k)
-                        site_name = site_item.text(0)
-                        enabled = site_item.checkState(1) == Qt.CheckState.Checked
-                        sites[site_name] = enabled
-                        
-                    field_config[category] = sites
-                    
-                field_configs[field_name] = field_config
-                
-            if "field_search_configs" not in cfg:
-                cfg["field_search_configs"] = {}
-            cfg["field_search_configs"][note_type] = field_configs
+        # Save site resource policies; only resources turned off are stored
+        site_policies = {}
+        for site_name, policy in self._site_policies.items():
+            disabled = {key: False for key in SITE_POLICY_KEYS if policy.get(key, True) is False}
+            if disabled:
+                site_policies[site_name] = disabled
+        cfg["site_policies"] = site_policies
+        cfg["site_css"] = self._site_css
             
-        # Save configuration
-        if config.save_config(cfg):
+        # Save configuration; written at once so a failure can be reported
+        if config.save_config(cfg, delay_ms=0):
             super().accept()
         else:
             showInfo("Failed to save configuration.")
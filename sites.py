@@ -0,0 +1,333 @@
+import json
+import os
+import re
+from collections import namedtuple
+from urllib.parse import urlsplit
+from . import config
+
+# Id of the pack built from config.PREDEFINED_SEARCH_SITES; user packs cannot use it.
+BUILTIN_PACK_ID = "builtin"
+PACK_FORMAT = 1
+
+# One search site of a pack. id is "<pack id>:<site id>" and stays the same across renames.
+SiteEntry = namedtuple("SiteEntry", ["id", "name", "category", "url", "host", "pack"])
+
+_PACK_ID_RE = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+class SitePackError(ValueError):
+    """A site pack file that cannot be read or does not follow the pack format."""
+
+def slugify(text):
+    """Return a lowercase id made of letters, digits and dashes."""
+    slug = re.sub(r"[^a-z0-9]+", "-", text.casefold()).strip("-")
+    return slug or "site"
+
+def site_host(url_template):
+    """Return the host a URL template points at, or "" when it has none."""
+    return urlsplit(url_template.replace("{}", "x")).hostname or ""
+
+def parse_pack(data):
+    """Validate a pack's JSON data and return (pack id, pack name, [SiteEntry])."""
+    if not isinstance(data, dict):
+        raise SitePackError("A site pack must be a JSON object.")
+    pack_id = data.get("id")
+    if not isinstance(pack_id, str) or not _PACK_ID_RE.match(pack_id):
+        raise SitePackError("The pack id must be lowercase letters, digits, '-' or '_'.")
+    if pack_id == BUILTIN_PACK_ID:
+        raise SitePackError(f'"{BUILTIN_PACK_ID}" is reserved for the built-in sites.')
+    if data.get("format", PACK_FORMAT) > PACK_FORMAT:
+        raise SitePackError(f"Pack {pack_id} needs a newer version of the add-on.")
+    sites = data.get("sites")
+    if not isinstance(sites, list):
+        raise SitePackError(f'Pack {pack_id} has no "sites" list.')
+
+    entries = []
+    seen_ids = set()
+    seen_names = set()
+    for number, site in enumerate(sites, 1):
+        if not isinstance(site, dict):
+            raise SitePackError(f"Site {number} of pack {pack_id} is not an object.")
+        name = site.get("name")
+        category = site.get("category")
+        url = site.get("url")
+        if not all(isinstance(value, str) and value.strip() for value in (name, category, url)):
+            raise SitePackError(f'Site {number} of pack {pack_id} needs a "name", "category" and "url".')
+        name, category, url = name.strip(), category.strip(), url.strip()
+        if "{}" not in url or urlsplit(url).scheme not in ("http", "https") or not site_host(url):
+            raise SitePackError(f"{name}: the URL must be http(s) and contain {{}} for the search term.")
+        site_id = str(site.get("id") or slugify(name))
+        if site_id in seen_ids or (category, name) in seen_names:
+            raise SitePackError(f"{name} appears twice in pack {pack_id}.")
+        seen_ids.add(site_id)
+        seen_names.add((category, name))
+        entries.append(SiteEntry(f"{pack_id}:{site_id}", name, category, url, site_host(url), pack_id))
+    return pack_id, str(data.get("name") or pack_id), entries
+
+def builtin_entries():
+    return [
+        SiteEntry(f"{BUILTIN_PACK_ID}:{slugify(name)}", name, category, url, site_host(url), BUILTIN_PACK_ID)
+        for category, sites in config.PREDEFINED_SEARCH_SITES.items()
+        for name, url in sites.items()
+    ]
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+class SiteRegistry:
+    """Every search site the add-on knows: the built-in sites and the user's site packs.
+
+    Packs are JSON files in user_files/site_packs. A small index of every
+    pack's (id, category, name, host) rows is kept in user_files/site_index.json
+    and only rebuilt for packs whose file changed, so listing categories,
+    site names and hosts never parses a pack. A pack's URL templates are
+    read the first time one of its sites is looked up. When two packs
+    define the same site name in a category, the later pack (by id) wins,
+    so a pack can also fix a built-in site's URL.
+    """
+    def __init__(self, packs_dir, index_path):
+        self.packs_dir = packs_dir
+        self.index_path = index_path
+        self._packs = {}  # pack id -> {"name", "file", "stamp", "sites": [[site id, category, name, host]]}
+        self._categories = {}  # category -> {site name: pack id}, in display order
+        self._hosts = {}  # host -> [(category, site name)]
+        self._names = {}  # site name -> [category]
+        self._ids = {}  # category -> {site name: site id}
+        self._id_sites = {}  # site id of every pack, overridden ones too -> (category, site name)
+        self._loaded = {}  # pack id -> {(category, site name): SiteEntry}
+        self.by_id = {}  # site id -> SiteEntry, for the packs loaded so far
+
+        builtin = builtin_entries()
+        self._packs[BUILTIN_PACK_ID] = {
+            "name": "Built-in sites", "file": None, "stamp": None,
+            "sites": [[entry.id, entry.category, entry.name, entry.host] for entry in builtin]}
+        self._store_loaded(BUILTIN_PACK_ID, builtin)
+        self._refresh_index()
+        self._build_indexes()
+
+    def _refresh_index(self):
+        """Bring the saved index up to date with the pack files, parsing only new or changed ones."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get("packs", {})
+        except (OSError, ValueError, AttributeError):
+            saved = {}
+
+        changed = False
+        found = set()
+        if os.path.isdir(self.packs_dir):
+            for file_name in sorted(os.listdir(self.packs_dir)):
+                if not file_name.endswith(".json"):
+                    continue
+                path = os.path.join(self.packs_dir, file_name)
+                try:
+                    stamp = _file_stamp(path)
+                except OSError:
+                    continue
+                indexed = next((pack_id for pack_id, pack in saved.items() if pack.get("file") == file_name), None)
+                if indexed is not None and saved[indexed].get("stamp") == stamp:
+                    self._packs[indexed] = saved[indexed]
+                    found.add(indexed)
+                    continue
+                changed = True
+                try:
+                    pack_id, name, entries = self._read_pack_file(path)
+                except SitePackError as e:
+                    print(f"Skipping site pack {file_name}: {e}")
+                    continue
+                if pack_id in found:
+                    print(f"Skipping site pack {file_name}: pack id {pack_id} is already used")
+                    continue
+                found.add(pack_id)
+                self._packs[pack_id] = self._index_entry(file_name, stamp, name, entries)
+                self._store_loaded(pack_id, entries)
+        if changed or set(saved) != found:
+            self._save_index()
+
+    @staticmethod
+    def _read_pack_file(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise SitePackError(str(e))
+        return parse_pack(data)
+
+    @staticmethod
+    def _index_entry(file_name, stamp, name, entries):
+        return {"name": name, "file": file_name, "stamp": stamp,
+                "sites": [[entry.id, entry.category, entry.name, entry.host] for entry in entries]}
+
+    def _save_index(self):
+        packs = {pack_id: pack for pack_id, pack in self._packs.items() if pack_id != BUILTIN_PACK_ID}
+        try:
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                json.dump({"format": PACK_FORMAT, "packs": packs}, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"Failed to save site index: {e}")
+
+    def _build_indexes(self):
+        self._categories = {}
+        self._hosts = {}
+        self._names = {}
+        self._ids = {}
+        self._id_sites = {}
+        # Built-in first, then user packs by id; later packs override a name in the same category
+        for pack_id in sorted(self._packs, key=lambda pack_id: (pack_id != BUILTIN_PACK_ID, pack_id)):
+            for site_id, category, name, host in self._packs[pack_id]["sites"]:
+                self._categories.setdefault(category, {})[name] = pack_id
+                self._ids.setdefault(category, {})[name] = site_id
+                self._id_sites[site_id] = (category, name)
+        for category, sites in self._categories.items():
+            for name, pack_id in sites.items():
+                self._names.setdefault(name, []).append(category)
+        for pack_id, pack in self._packs.items():
+            for site_id, category, name, host in pack["sites"]:
+                if host and self._categories[category][name] == pack_id:
+                    self._hosts.setdefault(host, []).append((category, name))
+
+    def _store_loaded(self, pack_id, entries):
+        self._loaded[pack_id] = {(entry.category, entry.name): entry for entry in entries}
+        for entry in entries:
+            self.by_id[entry.id] = entry
+
+    def _load_pack(self, pack_id):
+        """Return {(category, name): SiteEntry} of a pack, reading its file on first use."""
+        loaded = self._loaded.get(pack_id)
+        if loaded is not None:
+            return loaded
+        pack = self._packs.get(pack_id)
+        entries = []
+        if pack is not None:
+            try:
+                file_pack_id, name, entries = self._read_pack_file(os.path.join(self.packs_dir, pack["file"]))
+                if file_pack_id != pack_id:
+                    raise SitePackError(f"the file now holds pack {file_pack_id}")
+            except SitePackError as e:
+                print(f"Failed to load site pack {pack_id}: {e}")
+                entries = []
+        self._store_loaded(pack_id, entries)
+        return self._loaded[pack_id]
+
+    def categories(self):
+        return list(self._categories)
+
+    def site_names(self, category=None):
+        """Return the site names of a category, or of every category, without reading any pack."""
+        if category is not None:
+            return list(self._categories.get(category, {}))
+        return list(self._names)
+
+    def site_ids(self, category):
+        """Return {site name: site id} for a category, without reading any pack."""
+        return dict(self._ids.get(category, {}))
+
+    def has_site(self, site_id):
+        """Return True if site_id belongs to a known pack, even when a later pack overrides the site."""
+        return site_id in self._id_sites
+
+    def current_id(self, site_id):
+        """Return the id of the site that site_id is shown as: the overriding site's id when a
+        later pack overrides it, site_id itself otherwise (also for unknown ids)."""
+        key = self._id_sites.get(site_id)
+        if key is None:
+            return site_id
+        return self._ids[key[0]][key[1]]
+
+    def hosts(self):
+        return list(self._hosts)
+
+    def get(self, category, name):
+        """Return the SiteEntry for a site of a category, or None."""
+        pack_id = self._categories.get(category, {}).get(name)
+        if pack_id is None:
+            return None
+        return self._load_pack(pack_id).get((category, name))
+
+    def get_by_id(self, site_id):
+        """Return the SiteEntry for a site id, or None.
+
+        An id whose site a later pack overrides resolves to the overriding
+        site, so ids stored before the override follow it.
+        """
+        key = self._id_sites.get(site_id)
+        if key is None:
+            return None
+        return self.get(*key)
+
+    def sites(self, category):
+        """Return {name: SiteEntry} for every site of a category."""
+        sites = {}
+        for name in self._categories.get(category, {}):
+            entry = self.get(category, name)
+            if entry is not None:
+                sites[name] = entry
+        return sites
+
+    def find_by_name(self, name):
+        """Return the SiteEntry of every category that has a site with this name."""
+        entries = (self.get(category, name) for category in self._names.get(name, ()))
+        return [entry for entry in entries if entry is not None]
+
+    def site_names_on_host(self, host):
+        """Return the names of the sites whose pages are on host."""
+        return [name for category, name in self._hosts.get(host, ())]
+
+    def packs(self):
+        """Return [(pack id, pack name, site count)], built-in first."""
+        return [(pack_id, pack["name"], len(pack["sites"]))
+                for pack_id, pack in sorted(self._packs.items(), key=lambda item: (item[0] != BUILTIN_PACK_ID, item[0]))]
+
+    def import_pack(self, path):
+        """Copy a pack file into the packs folder, replacing a pack with the same id.
+
+        Returns (pack id, site count); raises SitePackError for an invalid pack.
+        """
+        pack_id, name, entries = self._read_pack_file(path)
+        os.makedirs(self.packs_dir, exist_ok=True)
+        file_name = f"{pack_id}.json"
+        previous = self._packs.get(pack_id)
+        if previous is not None and previous["file"] != file_name:
+            try:
+                os.remove(os.path.join(self.packs_dir, previous["file"]))
+            except OSError:
+                pass
+        target = os.path.join(self.packs_dir, file_name)
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(self._pack_data(pack_id, name, entries), f, indent=2, ensure_ascii=False)
+        self._packs[pack_id] = self._index_entry(file_name, _file_stamp(target), name, entries)
+        self._store_loaded(pack_id, entries)
+        self._build_indexes()
+        self._save_index()
+        config.clear_search_plans()
+        return pack_id, len(entries)
+
+    def export_pack(self, pack_id, path):
+        """Write a pack (the built-in sites too) to path in the pack format; returns the site count."""
+        if pack_id not in self._packs:
+            raise SitePackError(f"There is no pack {pack_id}.")
+        entries = list(self._load_pack(pack_id).values())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self._pack_data(pack_id, self._packs[pack_id]["name"], entries), f, indent=2, ensure_ascii=False)
+        return len(entries)
+
+    @staticmethod
+    def _pack_data(pack_id, name, entries):
+        return {
+            "format": PACK_FORMAT,
+            "id": pack_id,
+            "name": name,
+            "sites": [{"id": entry.id.partition(":")[2], "name": entry.name, "category": entry.category, "url": entry.url}
+                      for entry in entries],
+        }
+
+_registry = None
+
+def get_site_registry():
+    """Return the add-on wide SiteRegistry, indexing user_files/site_packs on first use."""
+    global _registry
+    if _registry is None:
+        user_files_dir = config.get_user_files_dir()
+        _registry = SiteRegistry(os.path.join(user_files_dir, "site_packs"),
+                                 os.path.join(user_files_dir, "site_index.json"))
+    return _registry
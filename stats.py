@@ -0,0 +1,121 @@
+import json
+import os
+import time
+from aqt.qt import QTimer
+from . import config
+
+# Upper bounds (ms) of the load time histogram buckets; the last bucket is open-ended.
+HISTOGRAM_BOUNDS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# loadProgress percentages whose first arrival is timed.
+PROGRESS_MILESTONES = (25, 50, 75, 100)
+
+# Only the most recent loads of each site are kept on disk.
+MAX_SAMPLES_PER_SITE = 200
+
+SAVE_DELAY_MS = 5000
+
+class LoadStats:
+    """Per-site page load timings, persisted to a rolling JSON file.
+
+    Each sample records when loadStarted, the progress milestones and
+    loadFinished arrived (ms after the load was requested) and whether the
+    load succeeded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.sites = {}  # site name -> {"category": str, "samples": [sample, ...]}
+        self._save_timer = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.sites = json.load(f).get("sites", {})
+        except Exception as e:
+            print(f"Failed to load page load statistics: {e}")
+            self.sites = {}
+
+    def save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({"sites": self.sites}, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Failed to save page load statistics: {e}")
+
+    def _schedule_save(self):
+        if self._save_timer is None:
+            self._save_timer = QTimer()
+            self._save_timer.setSingleShot(True)
+            self._save_timer.timeout.connect(self.save)
+        if not self._save_timer.isActive():
+            self._save_timer.start(SAVE_DELAY_MS)
+
+    def record(self, site, category, started_ms, milestones_ms, finished_ms, ok):
+        entry = self.sites.setdefault(site, {"category": category, "samples": []})
+        entry["category"] = category
+        entry["samples"].append({
+            "time": int(time.time()),
+            "ok": bool(ok),
+            "started": started_ms,
+            "progress": {str(p): ms for p, ms in milestones_ms.items()},
+            "finished": finished_ms,
+        })
+        del entry["samples"][:-MAX_SAMPLES_PER_SITE]
+        self._schedule_save()
+
+    def reset(self):
+        self.sites = {}
+        self.save()
+
+    def summary(self):
+        """Return one dict per site with counts, percentiles and the load time histogram."""
+        rows = []
+        for site, entry in sorted(self.sites.items()):
+            samples = entry["samples"]
+            finished = sorted(s["finished"] for s in samples if s["ok"] and s["finished"] is not None)
+            first_progress = sorted(
+                s["progress"][str(PROGRESS_MILESTONES[0])] for s in samples
+                if str(PROGRESS_MILESTONES[0]) in s["progress"])
+            histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+            for ms in finished:
+                histogram[_bucket(ms)] += 1
+            rows.append({
+                "site": site,
+                "category": entry.get("category", ""),
+                "loads": len(samples),
+                "failures": sum(1 for s in samples if not s["ok"]),
+                "median_ms": _percentile(finished, 50),
+                "p90_ms": _percentile(finished, 90),
+                "first_progress_ms": _percentile(first_progress, 50),
+                "histogram": histogram,
+            })
+        return rows
+
+def _bucket(ms):
+    for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+        if ms <= bound:
+            return i
+    return len(HISTOGRAM_BOUNDS_MS)
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def histogram_labels():
+    labels = [f"≤{bound / 1000:g}s" for bound in HISTOGRAM_BOUNDS_MS]
+    labels.append(f">{HISTOGRAM_BOUNDS_MS[-1] / 1000:g}s")
+    return labels
+
+_load_stats = None
+
+def get_load_stats():
+    """Return the add-on wide LoadStats, reading the stats file on first use."""
+    global _load_stats
+    if _load_stats is None:
+        _load_stats = LoadStats(os.path.join(config.get_user_files_dir(), "load_stats.json"))
+    return _load_stats
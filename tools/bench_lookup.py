@@ -0,0 +1,387 @@
+"""Offline end-to-end benchmark for the search sidebar.
+
+Serves fixture pages that stand in for the predefined dictionary sites from a
+local HTTP server, points a search plan at it and drives BrowserWidget
+headlessly (offscreen QPA) through a scripted run of N notes x M sites.
+
+Reports time to first tab, time to all tabs, peak RSS and the number of live
+web views. With --browser the notes are selected in a stand-in Browser dialog
+and searched through the add-on's SearchScheduler, as when walking a deck
+with the arrow keys, and its counters are reported too.
+
+Needs an environment where `aqt` and PyQt6-WebEngine import (for example a
+virtualenv with `pip install aqt[qt6]`); Anki itself does not need to be
+running.
+
+    python tools/bench_lookup.py --notes 20 --sites 10
+    python tools/bench_lookup.py --notes 500 --check-leaks
+    python tools/bench_lookup.py --notes 50 --browser --key-repeat 5
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "better_web_browser_bench"
+
+FIXTURE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{term} | {site}</title>
+<style>body {{ font-family: sans-serif; }} .def {{ margin: 4px 0; }}</style>
+</head><body>
+<header><nav>{nav}</nav></header>
+<main>
+<h1 class="headword">{term}</h1>
+<span class="ipa">/{term}/</span>
+{entries}
+</main>
+<footer>{filler}</footer>
+<script>document.body.dataset.ready = "1";</script>
+</body></html>
+"""
+
+def fixture_page(site, term, size_kb):
+    entries = "\n".join(
+        f'<div class="entry"><p class="def">Definition {i} of {term}.</p>'
+        f'<p class="examp">An example sentence using {term} ({i}).</p></div>'
+        for i in range(1, 6))
+    nav = " | ".join(f'<a href="/{i}">Menu {i}</a>' for i in range(20))
+    filler = "<p>" + ("Lorem ipsum dolor sit amet. " * 36) + "</p>"
+    page = FIXTURE_PAGE.format(site=site, term=term, nav=nav, entries=entries, filler="")
+    repeat = max(0, (size_kb * 1024 - len(page)) // len(filler))
+    return FIXTURE_PAGE.format(site=site, term=term, nav=nav, entries=entries, filler=filler * repeat)
+
+def start_fixture_server(size_kb, latency_ms):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.match(r"^/([^/]+)/([^/?]+)", self.path)
+            if not match:
+                self.send_error(404)
+                return
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            body = fixture_page(match.group(1), unquote(match.group(2)), size_kb).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def load_addon_modules():
+    """Import the add-on's modules without running __init__.py, which needs a running Anki."""
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON_DIR]
+    sys.modules[PACKAGE] = package
+    started = time.perf_counter()
+    config = importlib.import_module(f"{PACKAGE}.config")
+    config_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    browser = importlib.import_module(f"{PACKAGE}.browser")
+    browser_ms = (time.perf_counter() - started) * 1000
+    return config, browser, {"config_ms": config_ms, "browser_ms": browser_ms}
+
+def load_addon_init():
+    """Run the add-on's __init__.py in the bench package, for SearchScheduler.
+
+    It adds its menu to aqt.mw and config.py reads notes through it, so
+    aqt.mw has to be set to bench_main_window() before load_addon_modules().
+    """
+    package = sys.modules[PACKAGE]
+    package.__package__ = PACKAGE
+    package.__file__ = os.path.join(ADDON_DIR, "__init__.py")
+    with open(package.__file__, encoding="utf-8") as f:
+        exec(compile(f.read(), package.__file__, "exec"), package.__dict__)
+    return package
+
+class BenchNote(dict):
+    """A note of the Bench note type, whose Word field is the search term."""
+    mid = 1
+
+    def __init__(self, term):
+        super().__init__(Word=term, Meaning="")
+
+def bench_main_window(terms):
+    """Just enough of Anki's main window for __init__.py: its menu bar and a collection of Bench notes."""
+    from aqt.qt import QApplication, QMainWindow
+    window = QMainWindow()
+    window.app = QApplication.instance()
+    window.form = types.SimpleNamespace(menubar=window.menuBar(), menuHelp=window.menuBar().addMenu("Help"))
+    note_type = {"name": "Bench", "id": BenchNote.mid, "flds": [{"name": "Word"}, {"name": "Meaning"}]}
+    models = types.SimpleNamespace(get=lambda mid: note_type if mid == BenchNote.mid else None,
+                                   by_name=lambda name: note_type if name == "Bench" else None,
+                                   all=lambda: [note_type])
+    notes = [BenchNote(term) for term in terms]
+    window.col = types.SimpleNamespace(models=models, get_note=notes.__getitem__)
+    return window
+
+def bench_browser(main_window, sidebar, note_count):
+    """Just enough of Anki's Browser dialog for SearchScheduler: the selected row and the sidebar.
+
+    Note ids are row numbers; select() moves the current row.
+    """
+    from aqt.qt import QWidget
+    browser = QWidget()
+    browser.mw = main_window
+    browser._browser_sidebar = sidebar
+    browser.current_row = 0
+    browser.selected_notes = lambda: [browser.current_row]
+    current_index = types.SimpleNamespace(row=lambda: browser.current_row)
+    selection_model = types.SimpleNamespace(currentIndex=lambda: current_index)
+    model = types.SimpleNamespace(len_rows=lambda: note_count, index=lambda row, column: row,
+                                  get_note_id=lambda row: row)
+    browser.table = types.SimpleNamespace(_model=model, _view=types.SimpleNamespace(selectionModel=lambda: selection_model))
+    return browser
+
+def fixture_sites(package, port, site_count):
+    """Mirror the first site_count built-in sites as {site id: SiteEntry}, pointed at the local server."""
+    sites_module = importlib.import_module(f"{package}.sites")
+    sites = {}
+    for entry in sites_module.builtin_entries()[:site_count]:
+        slug = entry.id.partition(":")[2]
+        url = f"http://127.0.0.1:{port}/{slug}/{{}}"
+        sites[entry.id] = entry._replace(url=url, host="127.0.0.1")
+    return sites
+
+def rss_kb():
+    """Return (own RSS, RSS of own process tree) in KB from /proc, or (None, None) elsewhere."""
+    if not os.path.exists("/proc/self/status"):
+        return None, None
+    children = {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            children.setdefault(parent, []).append(int(pid))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    def process_rss(pid):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    own = process_rss(os.getpid())
+    total, stack = 0, [os.getpid()]
+    while stack:
+        pid = stack.pop()
+        total += process_rss(pid)
+        stack.extend(children.get(pid, []))
+    return own, total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notes", type=int, default=20, help="number of notes (search terms) to run")
+    parser.add_argument("--distinct-terms", type=int, default=0,
+                        help="cycle through this many terms to exercise the tab cache (default: all distinct)")
+    parser.add_argument("--sites", type=int, default=10, help="number of enabled sites per note")
+    parser.add_argument("--page-kb", type=int, default=200, help="size of each fixture page")
+    parser.add_argument("--latency-ms", type=int, default=50, help="server delay before each response")
+    parser.add_argument("--eager", action="store_true", help="disable lazy tabs, load every tab at once")
+    parser.add_argument("--tab-cache-mb", type=int, default=300, help="recent tab cache budget")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for one note's tabs")
+    parser.add_argument("--browser", action="store_true",
+                        help="select the notes in a stand-in Browser dialog and search them through SearchScheduler")
+    parser.add_argument("--key-repeat", type=int, default=1,
+                        help="with --browser, selection changes per note within the debounce window")
+    parser.add_argument("--prefetch-rows", type=int, default=0,
+                        help="with --browser, prefetch this many following notes (prefetch_rows)")
+    parser.add_argument("--check-leaks", action="store_true",
+                        help="turn the tab cache off and exit non-zero if the live view count grows after warm-up")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+    if args.prefetch_rows and not args.browser:
+        parser.error("--prefetch-rows needs --browser")
+    if args.check_leaks:
+        if args.prefetch_rows:
+            parser.error("--check-leaks turns the tab cache off, which --prefetch-rows needs")
+        # Cached tabs are kept alive on purpose; without them every note should leave the same views
+        args.tab_cache_mb = 0
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from aqt.qt import QApplication, QEvent, QEventLoop, QTimer
+    except ImportError as e:
+        # Exit 2 rather than 1, so a missing environment is not read as a regression
+        print(f"Cannot run the benchmark: aqt and PyQt6-WebEngine must import ({e})")
+        return 2
+
+    work_dir = tempfile.mkdtemp(prefix="bwb-bench-")
+    app = QApplication(sys.argv[:1])
+    terms = [f"word{i % (args.distinct_terms or args.notes)}" for i in range(args.notes)]
+    if args.browser:
+        import aqt
+        aqt.mw = bench_main_window(terms)
+    config, browser_module, import_times = load_addon_modules()
+    addon = load_addon_init() if args.browser else None
+
+    # Run against a throwaway config instead of the add-on's config.json
+    bench_config = config.get_default_config()
+    bench_config.update({
+        "lazy_tabs": not args.eager,
+        "tab_cache_budget_mb": args.tab_cache_mb,
+        "lifecycle_enabled": False,
+        "main_fields": {"Bench": "Word"},
+        "prefetch_rows": args.prefetch_rows,
+    })
+    config._config_path = os.path.join(work_dir, "config.json")
+    with open(config._config_path, "w", encoding="utf-8") as f:
+        json.dump(bench_config, f)
+
+    server = start_fixture_server(args.page_kb, args.latency_ms)
+    sites = fixture_sites(PACKAGE, server.server_address[1], args.sites)
+    plan_config = {
+        "configurable_fields": {"Bench": ["Meaning"]},
+        "enabled_sites": {"Bench": {"Meaning": list(sites)}},
+    }
+    plan = config.compile_search_plan(plan_config, "Bench", sites=sites)
+    # The fixture sites are not in the registry, so the Browser path gets the plan ready-made
+    config._search_plans["Bench"] = plan
+
+    def spin(milliseconds):
+        loop = QEventLoop()
+        QTimer.singleShot(milliseconds, loop.quit)
+        loop.exec()
+
+    def wait_until(predicate, timeout_s):
+        deadline = time.perf_counter() + timeout_s
+        while not predicate():
+            if time.perf_counter() > deadline:
+                return False
+            spin(2)
+        return True
+
+    def flush_deletes():
+        app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+        spin(0)
+
+    def tab_done(tab):
+        return tab.is_materialized() and tab.pending_url is None and not tab.loading and tab.load_ok
+
+    results = {"args": vars(args), "import_ms": import_times, "notes": []}
+
+    # Tab creation latency on the shared profile
+    creation_started = time.perf_counter()
+    scratch = [browser_module.TabWidget("about:blank") for _ in range(10)]
+    results["tab_creation_ms"] = (time.perf_counter() - creation_started) * 1000 / len(scratch)
+    for tab in scratch:
+        tab.dispose()
+    flush_deletes()
+
+    # get_config() throughput
+    calls, started = 0, time.perf_counter()
+    while time.perf_counter() - started < 0.5:
+        config.get_config()
+        calls += 1
+    results["get_config_per_second"] = calls / (time.perf_counter() - started)
+
+    widget = browser_module.BrowserWidget()
+    widget.resize(800, 900)
+    widget.show()
+    flush_deletes()
+
+    if args.browser:
+        browser_window = bench_browser(aqt.mw, widget, args.notes)
+        scheduler = addon.SearchScheduler(browser_window)
+
+    peak_tree_kb = 0
+    for i, term in enumerate(terms):
+        if args.browser:
+            # Timed from the last selection change, so the debounce delay is included
+            browser_window.current_row = i
+            for _ in range(args.key_repeat):
+                scheduler.schedule()
+            started = time.perf_counter()
+            wait_until(lambda: getattr(browser_window, "_last_browser_search", None) == (term, "Bench"), args.timeout)
+        else:
+            targets = config.build_search_urls(term, plan=plan)
+            started = time.perf_counter()
+            widget.open_urls(targets, term=config.normalize_term(term))
+
+        first_ok = wait_until(lambda: tab_done(widget.tabs.widget(0)), args.timeout)
+        first_ms = (time.perf_counter() - started) * 1000
+        expected = [widget.tabs.widget(j) for j in range(widget.tabs.count())
+                    if widget.tabs.widget(j).is_materialized()]
+        all_ok = wait_until(lambda: all(tab_done(tab) for tab in expected), args.timeout)
+        all_ms = (time.perf_counter() - started) * 1000
+
+        flush_deletes()
+        own_kb, tree_kb = rss_kb()
+        peak_tree_kb = max(peak_tree_kb, tree_kb or 0)
+        results["notes"].append({
+            "term": term,
+            "first_tab_ms": round(first_ms, 1) if first_ok else None,
+            "all_tabs_ms": round(all_ms, 1) if all_ok else None,
+            "loaded_tabs": len(expected),
+            "live_views": browser_module.TabWidget.live_views,
+            "rss_kb": own_kb,
+            "tree_rss_kb": tree_kb,
+        })
+
+    server.shutdown()
+
+    notes = results["notes"]
+    first = sorted(n["first_tab_ms"] for n in notes if n["first_tab_ms"] is not None)
+    every = sorted(n["all_tabs_ms"] for n in notes if n["all_tabs_ms"] is not None)
+    live = [n["live_views"] for n in notes]
+    warmup = min(len(live), 10)
+    results["summary"] = {
+        "median_first_tab_ms": first[len(first) // 2] if first else None,
+        "median_all_tabs_ms": every[len(every) // 2] if every else None,
+        "timeouts": sum(1 for n in notes if n["all_tabs_ms"] is None),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_tree_rss_kb": peak_tree_kb or None,
+        "live_views_after_warmup": live[warmup - 1] if live else 0,
+        "live_views_max": max(live[warmup:] or live) if live else 0,
+        "cache_stats": dict(widget.cache_stats),
+        "selection_stats": dict(scheduler.stats) if args.browser else None,
+        "prefetch_stats": dict(widget.prefetch_stats),
+    }
+
+    summary = results["summary"]
+    print(f"Notes x sites:          {args.notes} x {len(plan)} ({'eager' if args.eager else 'lazy'} tabs)")
+    print(f"Import time:            config {import_times['config_ms']:.1f} ms, browser {import_times['browser_ms']:.1f} ms")
+    print(f"Tab creation:           {results['tab_creation_ms']:.1f} ms per tab")
+    print(f"get_config():           {results['get_config_per_second']:,.0f} calls/s")
+    print(f"Time to first tab:      median {summary['median_first_tab_ms']} ms")
+    print(f"Time to all tabs:       median {summary['median_all_tabs_ms']} ms ({summary['timeouts']} timeouts)")
+    print(f"Peak RSS:               {summary['peak_rss_kb']:,} KB (process tree {summary['peak_tree_rss_kb']} KB)")
+    print(f"Live views:             {summary['live_views_after_warmup']} after warm-up, {summary['live_views_max']} max after it")
+    print(f"Tab cache:              {summary['cache_stats']}")
+    if args.browser:
+        print(f"Selection changes:      {summary['selection_stats']}")
+    prefetch = summary["prefetch_stats"]
+    hit_rate = f", {prefetch['hits'] / prefetch['issued']:.0%} used" if prefetch["issued"] else ""
+    print(f"Prefetch:               {prefetch}{hit_rate}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.check_leaks and summary["live_views_max"] > summary["live_views_after_warmup"]:
+        print("FAIL: live view count grew after warm-up")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
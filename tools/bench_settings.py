@@ -0,0 +1,100 @@
+"""Timing check for the settings dialog's sites tree.
+
+Opens SettingsDialog headlessly (offscreen QPA) for a note type with many
+fields, then ticks and unticks fields and filters the sites tree, and
+reports how long each step takes. The collection is a stand-in that only
+provides the note type, so Anki does not have to be running, but `aqt`
+must import (for example a virtualenv with `pip install aqt[qt6]`).
+
+    python tools/bench_settings.py --fields 40
+    python tools/bench_settings.py --fields 80 --max-toggle-ms 10
+"""
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "better_web_browser_settings_bench"
+
+class FakeModels:
+    """Just enough of ModelManager for SettingsDialog: one note type with the given fields."""
+    def __init__(self, field_count):
+        self.note_type = {"name": "Bench", "id": 1, "flds": [{"name": f"Field {i}"} for i in range(field_count)]}
+
+    def all(self):
+        return [self.note_type]
+
+    def by_name(self, name):
+        return self.note_type if name == self.note_type["name"] else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fields", type=int, default=40, help="fields of the note type")
+    parser.add_argument("--checked", type=int, default=None, help="fields ticked when the dialog opens (default: half)")
+    parser.add_argument("--repeat", type=int, default=20, help="toggles to time")
+    parser.add_argument("--max-toggle-ms", type=float, default=0, help="exit non-zero if the median toggle is slower")
+    args = parser.parse_args()
+    checked = args.fields // 2 if args.checked is None else args.checked
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import aqt
+    from aqt.qt import QApplication, Qt
+    app = QApplication.instance() or QApplication(sys.argv)
+    models = FakeModels(args.fields)
+    aqt.mw = types.SimpleNamespace(col=types.SimpleNamespace(models=models))
+
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON_DIR]
+    sys.modules[PACKAGE] = package
+    config = importlib.import_module(f"{PACKAGE}.config")
+    config._config_path = os.path.join(tempfile.mkdtemp(), "config.json")
+    cfg = config.get_default_config()
+    cfg["note_type"] = "Bench"
+    cfg["configurable_fields"] = {"Bench": [field["name"] for field in models.note_type["flds"][:checked]]}
+    config.save_config(cfg)
+    settings = importlib.import_module(f"{PACKAGE}.settings")
+
+    started = time.perf_counter()
+    dialog = settings.SettingsDialog()
+    open_ms = (time.perf_counter() - started) * 1000
+
+    # Each field is flipped and flipped back, so the dialog ends as it started
+    toggle_ms = []
+    for i in range(args.repeat):
+        item = dialog.fields_list.item(i % args.fields)
+        states = [Qt.CheckState.Checked, Qt.CheckState.Unchecked]
+        if item.checkState() == Qt.CheckState.Checked:
+            states.reverse()
+        for state in states:
+            started = time.perf_counter()
+            item.setCheckState(state)
+            app.processEvents()
+            toggle_ms.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    dialog.filter_sites("dict")
+    app.processEvents()
+    filter_ms = (time.perf_counter() - started) * 1000
+    dialog.filter_sites("")
+
+    median_toggle = statistics.median(toggle_ms)
+    registry = importlib.import_module(f"{PACKAGE}.sites").get_site_registry()
+    print(f"Fields: {args.fields} ({checked} ticked), sites per field: "
+          f"{sum(len(registry.site_names(category)) for category in registry.categories())}")
+    print(f"Open dialog:      {open_ms:.1f} ms")
+    print(f"Toggle a field:   median {median_toggle:.2f} ms, max {max(toggle_ms):.2f} ms ({len(toggle_ms)} toggles)")
+    print(f"Filter sites:     {filter_ms:.1f} ms")
+    dialog.reject()
+
+    if args.max_toggle_ms and median_toggle > args.max_toggle_ms:
+        print(f"FAIL: toggling a field took longer than {args.max_toggle_ms} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Check that repaints do not add connections or shortcuts to a window.
+
+Builds a dialog like Anki's Add dialog, with a Close action on Ctrl+W and a
+few other actions and shortcuts, installs the add-on's WindowCommandRouter
+on it headlessly (offscreen QPA) and sends it Paint events. The number of
+slots connected to every action's triggered signal and the number of
+shortcuts must be the same afterwards. Anki does not have to be running,
+but `aqt` must import (for example a virtualenv with `pip install aqt[qt6]`).
+
+    python tools/check_command_router.py
+    python tools/check_command_router.py --paints 10000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import types
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "better_web_browser_router_check"
+
+def connection_counts(window, QAction, QShortcut):
+    """Slots connected to each action's triggered signal, and the window's shortcut count."""
+    actions = {action.text(): action.receivers(action.triggered) for action in window.findChildren(QAction)}
+    return actions, len(window.findChildren(QShortcut))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--paints", type=int, default=1000, help="Paint events to send to the dialog")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import aqt
+    from aqt.qt import (QAction, QApplication, QCoreApplication, QDialog, QKeySequence, QMainWindow,
+                        QPaintEvent, QPushButton, QShortcut, QVBoxLayout)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # The add-on adds its menu to the main window when it is imported
+    main_window = QMainWindow()
+    main_window.app = app
+    main_window.form = types.SimpleNamespace(menubar=main_window.menuBar(),
+                                             menuHelp=main_window.menuBar().addMenu("Help"))
+    aqt.mw = main_window
+
+    # Unlike the benchmarks, this needs the package's own __init__.py, where the router lives
+    spec = importlib.util.spec_from_file_location(PACKAGE, os.path.join(ADDON_DIR, "__init__.py"),
+                                                  submodule_search_locations=[ADDON_DIR])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = addon
+    spec.loader.exec_module(addon)
+
+    dialog = QDialog()
+    layout = QVBoxLayout(dialog)
+    button = QPushButton("Add", dialog)
+    layout.addWidget(button)
+    close_action = QAction("Close", dialog)
+    close_action.setShortcut(QKeySequence("Ctrl+W"))
+    close_action.triggered.connect(dialog.close)
+    dialog.addAction(close_action)
+    for name in ("History", "Help"):
+        action = QAction(name, dialog)
+        action.triggered.connect(lambda: None)
+        dialog.addAction(action)
+    QShortcut(QKeySequence("Ctrl+Return"), dialog).activated.connect(lambda: None)
+    dialog.resize(400, 300)
+    dialog.show()
+
+    # show_browser_sidebar() installs the router every time the sidebar is opened
+    router = addon.install_command_router(dialog)
+    if addon.install_command_router(dialog) is not router:
+        print("FAIL: install_command_router() installed a second router")
+        return 1
+
+    before = connection_counts(dialog, QAction, QShortcut)
+    started = time.perf_counter()
+    for _ in range(args.paints):
+        QCoreApplication.sendEvent(dialog, QPaintEvent(dialog.rect()))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    app.processEvents()
+    after = connection_counts(dialog, QAction, QShortcut)
+
+    print(f"{args.paints} Paint events in {elapsed_ms:.1f} ms ({elapsed_ms * 1000 / max(1, args.paints):.1f} us each)")
+    print(f"{'action':<10} {'before':>6} {'after':>6}")
+    for name, count in before[0].items():
+        print(f"{name:<10} {count:>6} {after[0].get(name, 0):>6}")
+    print(f"{'shortcuts':<10} {before[1]:>6} {after[1]:>6}")
+    if after != before:
+        print("FAIL: repaints changed the connections or shortcuts of the dialog")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
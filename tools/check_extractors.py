@@ -0,0 +1,116 @@
+"""Run the reader mode extractors against saved pages.
+
+Save a dictionary page (for example with "Save Page As... / HTML only" in a
+desktop browser) and point this script at it with the site name the page
+belongs to. The extracted definitions, IPA and examples are printed, so a
+site whose markup changed shows up as empty output. With --expect the result
+is compared with a JSON file written earlier by --write-expected, and the
+script exits non-zero when they differ. Needs only the standard library.
+
+--all checks every registered extractor against its fixture in fixtures/:
+<site>-run.html, a trimmed page of the word "run", and <site>-run.json, the
+output it is expected to give. It exits non-zero when a fixture is missing
+or an extractor's output differs.
+
+    python tools/check_extractors.py --all
+    python tools/check_extractors.py "Cambridge Dictionary" fixtures/cambridge-dictionary-run.html
+    python tools/check_extractors.py "Oxford Dictionary" oxford.html --write-expected oxford.json
+    python tools/check_extractors.py "Oxford Dictionary" oxford.html --expect oxford.json
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import sys
+import types
+import unicodedata
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ADDON_DIR, "fixtures")
+PACKAGE = "better_web_browser_extractors"
+
+def load_reader_module():
+    """Import reader.py without running __init__.py; extraction itself does not need aqt."""
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ADDON_DIR]
+    sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.reader")
+
+def fixture_name(site):
+    """Return the fixture file name stem of a site, e.g. "cambridge-viet" for "Cambridge Việt"."""
+    ascii_name = unicodedata.normalize("NFKD", site).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
+
+def extract_page(reader, site, page):
+    with open(page, "r", encoding="utf-8", errors="replace") as f:
+        definitions, ipa, examples = reader.extract(site, f.read())
+    return {"definitions": definitions, "ipa": ipa, "examples": examples}
+
+def check_all(reader, fixtures_dir):
+    """Check every registered extractor against its fixture page; return the number of failures."""
+    failures = 0
+    for site in reader.EXTRACTORS:
+        stem = os.path.join(fixtures_dir, fixture_name(site) + "-run")
+        if not os.path.exists(stem + ".html") or not os.path.exists(stem + ".json"):
+            print(f"FAIL {site}: no fixture {stem}.html / .json")
+            failures += 1
+            continue
+        result = extract_page(reader, site, stem + ".html")
+        with open(stem + ".json", "r", encoding="utf-8") as f:
+            expected = json.load(f)
+        if result != expected:
+            print(f"FAIL {site}: result differs from {stem}.json")
+            for kind in result:
+                if result[kind] != expected.get(kind):
+                    print(f"  {kind}: got {result[kind]!r}, expected {expected.get(kind)!r}")
+            failures += 1
+            continue
+        counts = ", ".join(f"{len(items)} {kind}" for kind, items in result.items())
+        print(f"OK   {site}: {counts}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("site", nargs="?", help="site name as listed in the settings, e.g. \"Cambridge Dictionary\"")
+    parser.add_argument("page", nargs="?", help="saved HTML page of that site")
+    parser.add_argument("--all", action="store_true", help="check every registered extractor against its fixture")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="fixture folder used by --all")
+    parser.add_argument("--expect", metavar="JSON", help="compare the result with an earlier --write-expected file")
+    parser.add_argument("--write-expected", metavar="JSON", help="write the result as the expected output")
+    args = parser.parse_args()
+
+    reader = load_reader_module()
+    if args.all:
+        failures = check_all(reader, args.fixtures)
+        print(f"{len(reader.EXTRACTORS) - failures} of {len(reader.EXTRACTORS)} extractors match their fixtures")
+        return 1 if failures else 0
+    if not args.site or not args.page:
+        parser.error("give a site and a saved page, or --all")
+
+    if args.site not in reader.EXTRACTORS:
+        print(f"No extractor registered for {args.site!r}; only the page description is used.")
+
+    result = extract_page(reader, args.site, args.page)
+
+    for kind, items in result.items():
+        print(f"{kind}:")
+        for item in items:
+            print(f"  - {item}")
+        if not items:
+            print("  (none)")
+
+    if args.write_expected:
+        with open(args.write_expected, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.expect:
+        with open(args.expect, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+        if expected != result:
+            print(f"FAIL: result differs from {args.expect}")
+            return 1
+        print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Check that importing the add-on loads none of its modules but config.py.
+
+browser.py (QtWebEngine), settings.py, reader.py, diagnostics.py and the
+rest are imported on first use, so Anki startup does not pay for them. This
+imports the package's __init__.py headlessly (offscreen QPA) with a
+stand-in main window, then lists which of the add-on's modules ended up in
+sys.modules, and exits non-zero when any but config.py did. Anki does not
+have to be running, but `aqt` must import (for example a virtualenv with
+`pip install aqt[qt6]`).
+
+    python tools/check_lazy_imports.py
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import types
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "better_web_browser_import_check"
+# Modules __init__.py may import at startup
+STARTUP_MODULES = {"config"}
+
+def addon_modules():
+    return sorted(name[:-len(".py")] for name in os.listdir(ADDON_DIR)
+                  if name.endswith(".py") and name != "__init__.py")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import aqt
+    from aqt.qt import QApplication, QMainWindow
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # The add-on adds its menu to the main window when it is imported
+    main_window = QMainWindow()
+    main_window.app = app
+    main_window.form = types.SimpleNamespace(menubar=main_window.menuBar(),
+                                             menuHelp=main_window.menuBar().addMenu("Help"))
+    aqt.mw = main_window
+
+    spec = importlib.util.spec_from_file_location(PACKAGE, os.path.join(ADDON_DIR, "__init__.py"),
+                                                  submodule_search_locations=[ADDON_DIR])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = addon
+    started = time.perf_counter()
+    spec.loader.exec_module(addon)
+    import_ms = (time.perf_counter() - started) * 1000
+
+    loaded = [name for name in addon_modules() if f"{PACKAGE}.{name}" in sys.modules]
+    unexpected = [name for name in loaded if name not in STARTUP_MODULES]
+    print(f"__init__.py imported in {import_ms:.1f} ms")
+    print(f"Loaded at startup: {', '.join(loaded) or '(none)'}")
+    print(f"Left for first use: {', '.join(name for name in addon_modules() if name not in loaded)}")
+    if unexpected:
+        print(f"FAIL: importing the add-on also loaded {', '.join(unexpected)}")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())